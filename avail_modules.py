@@ -1,8 +1,10 @@
 # 38 modules active
 # This file lists available Weaviate modules
 
+from itertools import chain
+
 # Generative modules
-GENERATIVE_MODULES = [
+GENERATIVE_MODULES = (
     "generative-anthropic",
     "generative-anyscale",
     "generative-aws",
@@ -15,43 +17,43 @@ GENERATIVE_MODULES = [
     "generative-ollama",
     "generative-openai",
     "generative-palm",
-    "generative-xai"
-]
+    "generative-xai",
+)
 
 # Multi2vec modules
-MULTI2VEC_MODULES = [
+MULTI2VEC_MODULES = (
     "multi2vec-cohere",
     "multi2vec-jinaai",
     "multi2vec-nvidia",
     "multi2vec-palm",
-    "multi2vec-voyageai"
-]
+    "multi2vec-voyageai",
+)
 
 # QnA modules
-QNA_MODULES = [
-    "qna-openai"
-]
+QNA_MODULES = (
+    "qna-openai",
+)
 
 # Ref2vec modules
-REF2VEC_MODULES = [
-    "ref2vec-centroid"
-]
+REF2VEC_MODULES = (
+    "ref2vec-centroid",
+)
 
 # Reranker modules
-RERANKER_MODULES = [
+RERANKER_MODULES = (
     "reranker-cohere",
     "reranker-jinaai",
     "reranker-nvidia",
-    "reranker-voyageai"
-]
+    "reranker-voyageai",
+)
 
 # Text2colbert modules
-TEXT2COLBERT_MODULES = [
-    "text2colbert-jinaai"
-]
+TEXT2COLBERT_MODULES = (
+    "text2colbert-jinaai",
+)
 
 # Text2vec modules
-TEXT2VEC_MODULES = [
+TEXT2VEC_MODULES = (
     "text2vec-aws",
     "text2vec-cohere",
     "text2vec-databricks",
@@ -64,16 +66,25 @@ TEXT2VEC_MODULES = [
     "text2vec-openai",
     "text2vec-palm",
     "text2vec-voyageai",
-    "text2vec-weaviate"
-]
+    "text2vec-weaviate",
+)
 
 # All modules combined
-ALL_MODULES = (
-    GENERATIVE_MODULES + 
-    MULTI2VEC_MODULES + 
-    QNA_MODULES + 
-    REF2VEC_MODULES + 
-    RERANKER_MODULES + 
-    TEXT2COLBERT_MODULES + 
+ALL_MODULES = tuple(chain(
+    GENERATIVE_MODULES,
+    MULTI2VEC_MODULES,
+    QNA_MODULES,
+    REF2VEC_MODULES,
+    RERANKER_MODULES,
+    TEXT2COLBERT_MODULES,
     TEXT2VEC_MODULES
-)
+))
+
+# Module-name prefixes ("text2vec" in "text2vec-openai") that name a category
+MODULE_PREFIXES = frozenset(m.partition('-')[0] for m in ALL_MODULES)
+
+# Set view of all modules for membership checks
+ALL_MODULES_SET = frozenset(ALL_MODULES)
+
+# OpenAI-backed modules
+OPENAI_MODULES = frozenset(m for m in ALL_MODULES if 'openai' in m)
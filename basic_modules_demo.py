@@ -3,10 +3,13 @@
 import os
 import sys
 import logging
-import json
-from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List
+from config import settings
+from avail_modules import OPENAI_MODULES
+from log_utils import LazyJson, section
+from weaviate_client import cached_get_meta, get_client
 
 # Set up logging
 logging.basicConfig(
@@ -22,41 +25,32 @@ logger = logging.getLogger("BasicModulesDemo")
 ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-# Load environment variables from .env file
-load_dotenv(os.path.join(ROOT, '.env'))
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL or WEAVIATE_API_KEY")
     sys.exit(1)
 
 
+@dataclass(frozen=True)
+class ModulesView:
+    """Modules reported by Weaviate plus precomputed lookup sets."""
+    modules: Dict[str, Any] = field(default_factory=dict)
+    keys: FrozenSet[str] = frozenset()
+    openai_keys: FrozenSet[str] = frozenset()
+    groups: Dict[str, List[str]] = field(default_factory=dict)
+
+
 def connect_to_weaviate():
     """Connect to Weaviate Cloud instance."""
     logger.info(f"Connecting to Weaviate at {weaviate_url}")
     
-    headers = {}
-    if openai_api_key:
-        headers["X-OpenAI-Api-Key"] = openai_api_key
-    
     try:
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=weaviate_url,
-            auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-            headers=headers
-        )
-        
-        # Check if client is ready
-        is_ready = client.is_ready()
-        logger.info(f"Connection status: {is_ready}")
-        
-        if not is_ready:
-            logger.error("Weaviate client is not ready")
-            return None
-        
-        return client
+        return get_client()
     except Exception as e:
         logger.error(f"Error connecting to Weaviate: {e}")
         return None
@@ -65,55 +59,61 @@ def connect_to_weaviate():
 def get_available_modules(client):
     """Get available modules from Weaviate."""
     try:
-        meta = client.get_meta()
+        meta = cached_get_meta(client)
         
         # Print Weaviate version
-        if 'version' in meta:
-            logger.info(f"Weaviate version: {meta['version']}")
+        if (version := meta.get('version')) is not None:
+            logger.info(f"Weaviate version: {version}")
         
         # Extract and print modules
-        modules = {}
-        if 'modules' in meta:
-            modules = meta['modules']
+        if (modules := meta.get('modules')) is not None:
             logger.info(f"Found {len(modules)} modules")
             
-            # Group modules by type
-            module_groups = {}
+            # Group modules by type; sorting once up front leaves every group sorted
+            module_groups = defaultdict(list)
             
-            for module_name in modules:
-                prefix = module_name.split('-')[0] if '-' in module_name else "other"
-                if prefix not in module_groups:
-                    module_groups[prefix] = []
-                module_groups[prefix].append(module_name)
+            for module_name in sorted(modules):
+                prefix, sep, _ = module_name.partition('-')
+                module_groups[prefix if sep else "other"].append(module_name)
+            
+            sorted_groups = sorted(module_groups.items())
             
             # Print modules by group
-            for group, group_modules in sorted(module_groups.items()):
+            for group, group_modules in sorted_groups:
                 logger.info(f"  {group.upper()} MODULES:")
-                for module in sorted(group_modules):
+                for module in group_modules:
                     logger.info(f"    - {module}")
-        else:
-            logger.warning("No modules found in Weaviate meta information")
+            
+            module_keys = frozenset(modules)
+            return ModulesView(
+                modules=modules,
+                keys=module_keys,
+                openai_keys=module_keys & OPENAI_MODULES,
+                groups=dict(sorted_groups)
+            )
         
-        return modules
+        logger.warning("No modules found in Weaviate meta information")
+        return ModulesView()
     except Exception as e:
         logger.error(f"Error getting modules: {e}")
-        return {}
+        return ModulesView()
 
 
-def explore_openai_modules(modules):
+def explore_openai_modules(view):
     """Explore OpenAI modules specifically."""
-    logger.info("\n=== EXPLORING OPENAI MODULES ===\n")
+    section("EXPLORING OPENAI MODULES")
     
-    openai_modules = [m for m in modules.keys() if 'openai' in m]
+    modules = view.modules
+    openai_modules = sorted(view.openai_keys)
     
     if openai_modules:
         logger.info(f"Found {len(openai_modules)} OpenAI modules:")
-        for module in sorted(openai_modules):
+        for module in openai_modules:
             logger.info(f"  - {module}")
             
             # Print module details if available
             if modules[module]:
-                logger.info(f"    Details: {json.dumps(modules[module], indent=2)}")
+                logger.info("    Details: %s", LazyJson(modules[module]))
     else:
         logger.warning("No OpenAI modules found")
 
@@ -122,8 +122,6 @@ def main():
     """Main function to demonstrate basic Weaviate module exploration."""
     logger.info("Starting basic Weaviate modules demonstration")
     
-    client = None
-    
     try:
         # Connect to Weaviate
         client = connect_to_weaviate()
@@ -133,29 +131,32 @@ def main():
             sys.exit(1)
         
         # Get available modules
-        modules = get_available_modules(client)
+        view = get_available_modules(client)
         
         # Explore OpenAI modules specifically
-        explore_openai_modules(modules)
+        explore_openai_modules(view)
         
         # Print a summary of the available modules
-        logger.info("\n=== MODULE AVAILABILITY SUMMARY ===\n")
+        section("MODULE AVAILABILITY SUMMARY")
         
         # Check for specific modules of interest
-        modules_of_interest = [
+        modules_of_interest = frozenset([
             "text2vec-openai",      # For text vectorization
             "generative-openai",     # For text generation
             "qna-openai",            # For question answering
             "text2vec-huggingface",  # Alternative vectorizer
             "generative-cohere",     # Alternative generator
             "multi2vec-clip"         # For multi-modal (text+image)
-        ]
+        ])
         
-        for module in modules_of_interest:
-            status = "✅ Available" if module in modules else "❌ Not available"
-            logger.info(f"{module}: {status}")
+        available = modules_of_interest & view.keys
+        rows = [
+            f"{module}: {'✅ Available' if module in available else '❌ Not available'}"
+            for module in sorted(modules_of_interest)
+        ]
+        logger.info("Modules of interest:\n%s", "\n".join(rows))
         
-        logger.info("\nTo use these modules in your applications:")
+        logger.info("To use these modules in your applications:")
         logger.info("1. For text2vec-openai: Set it as the vectorizer when creating a class/collection")
         logger.info("2. For generative-openai: Use it in GraphQL queries with the generate() function")
         logger.info("3. For qna-openai: Use it for question answering over your data")
@@ -163,9 +164,7 @@ def main():
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
     finally:
-        # Clean up
-        if client:
-            client.close()
+        # The shared client is closed at interpreter exit
         logger.info("Basic Weaviate modules demonstration completed")
 
 
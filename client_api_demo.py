@@ -4,10 +4,10 @@ import os
 import sys
 import time
 import logging
-import json
-from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+from log_utils import LazyJson, section
+from weaviate_client import cached_get_meta, get_client, post_first_success
 
 # Set up logging
 logging.basicConfig(
@@ -23,11 +23,11 @@ logger = logging.getLogger("WeaviateClientDemo")
 ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-# Load environment variables
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key or not openai_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL, WEAVIATE_API_KEY, or OPENAI_API_KEY")
@@ -36,42 +36,50 @@ if not weaviate_url or not weaviate_api_key or not openai_api_key:
 # Define the class name for our demo
 CLASS_NAME = "AIArticles"
 
+# GraphQL payload for the module meta probe
+META_GQL_QUERY = {"query": "{ Meta { modules { module version } } }"}
+
+def fetch_all_meta(client):
+    """Fetch meta information and schema in one overlapped round-trip.
+
+    Weaviate does not serve meta or class schemas over GraphQL, so the two
+    REST calls are issued concurrently rather than merged into one query.
+    Returns (meta, schema); schema is None if it could not be retrieved.
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        meta_future = executor.submit(cached_get_meta, client)
+        schema_future = executor.submit(client.get_schema)
+        
+        meta = meta_future.result()
+        try:
+            schema = schema_future.result()
+        except Exception as e:
+            logger.error(f"Error getting schema: {e}")
+            logger.info("Continuing with the demo...")
+            schema = None
+    
+    return meta, schema
+
+
 def main():
     """Main function to demonstrate Weaviate client API."""
     logger.info("Starting Weaviate client API demonstration")
     
-    client = None
-    
     try:
         # Connect to Weaviate
         logger.info(f"Connecting to Weaviate at {weaviate_url}")
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=weaviate_url,
-            auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-            headers={
-                "X-OpenAI-Api-Key": openai_api_key  # For OpenAI modules
-            }
-        )
-        
-        # Check if client is ready
-        is_ready = client.is_ready()
-        logger.info(f"Connection status: {is_ready}")
+        client = get_client()
         
-        if not is_ready:
-            logger.error("Weaviate client is not ready")
-            sys.exit(1)
-        
-        # Get meta information
-        logger.info("Retrieving meta information")
-        meta = client.get_meta()
+        # Get meta and schema information
+        logger.info("Retrieving meta and schema information")
+        meta, schema = fetch_all_meta(client)
         
         # Print Weaviate version
-        if 'version' in meta:
-            logger.info(f"Weaviate version: {meta['version']}")
+        if (version := meta.get('version')) is not None:
+            logger.info(f"Weaviate version: {version}")
         
         # Check available modules
-        if 'modules' in meta:
-            modules = meta['modules']
+        if (modules := meta.get('modules')) is not None:
             logger.info(f"Found {len(modules)} modules")
             
             # Check if the required OpenAI modules are available
@@ -85,21 +93,14 @@ def main():
             else:
                 logger.warning("generative-openai module is not available")
         
-        # Try to get schema information
-        try:
-            logger.info("Attempting to get schema information")
-            schema = client.get_schema()
-            
-            if schema:
-                logger.info(f"Schema: {json.dumps(schema, indent=2)}")
-            else:
-                logger.info("No schema found")
-        except Exception as e:
-            logger.error(f"Error getting schema: {e}")
-            logger.info("Continuing with the demo...")
+        # Report schema information
+        if schema:
+            logger.info("Schema: %s", LazyJson(schema))
+        else:
+            logger.info("No schema found")
         
         # Try to use the client's query builder
-        logger.info("\n=== DEMONSTRATING STANDALONE GENERATIVE AI ===\n")
+        section("DEMONSTRATING STANDALONE GENERATIVE AI")
         
         prompt = "Explain the concept of vector embeddings in AI in 3 sentences."
         logger.info(f"Using generative-openai module with prompt: '{prompt}'")
@@ -113,46 +114,29 @@ def main():
                 )
                 logger.info(f"Generated response: {result}")
             except AttributeError:
-                # If the generate method is not available, try using the modules endpoint directly
-                logger.info("Client generate method not available, trying direct API call")
-                response = client._connection.post(
-                    "v1/modules/generative-openai/generate",
+                # If the generate method is not available, probe the modules endpoints directly
+                logger.info("Client generate method not available, trying direct API calls")
+                path, response = post_first_success(
+                    client,
+                    ["v1/modules/generative-openai/generate", "modules/generative-openai/generate"],
                     {
                         "prompt": prompt
                     }
                 )
                 
-                if response.status_code == 200:
+                if response is not None:
                     data = response.json()
-                    if "result" in data:
-                        logger.info(f"Generated response: {data['result']}")
+                    if (result := data.get("result")) is not None:
+                        logger.info(f"Generated response via {path}: {result}")
                     else:
                         logger.warning("No result found in response")
                 else:
-                    logger.warning(f"Generate failed: {response.status_code} - {response.text}")
-                    
-                    # Try alternative path
-                    logger.info("Trying alternative API path")
-                    response = client._connection.post(
-                        "modules/generative-openai/generate",
-                        {
-                            "prompt": prompt
-                        }
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if "result" in data:
-                            logger.info(f"Generated response: {data['result']}")
-                        else:
-                            logger.warning("No result found in response")
-                    else:
-                        logger.warning(f"Generate failed: {response.status_code} - {response.text}")
+                    logger.warning("Generate failed on all API paths")
         except Exception as e:
             logger.error(f"Error using generative AI: {e}")
         
         # Try to use the client's query builder for GraphQL
-        logger.info("\n=== TRYING DIFFERENT GRAPHQL QUERY APPROACHES ===\n")
+        section("TRYING DIFFERENT GRAPHQL QUERY APPROACHES")
         
         try:
             # Try using the client's query builder if available
@@ -166,7 +150,7 @@ def main():
                     .with_limit(2)
                     .do()
                 )
-                logger.info(f"Query result: {json.dumps(result, indent=2)}")
+                logger.info("Query result: %s", LazyJson(result))
             except AttributeError:
                 logger.info("Client query builder not available or no data found")
                 
@@ -176,41 +160,24 @@ def main():
                 # Try different paths for GraphQL endpoint
                 paths = ["v1/graphql", "graphql"]
                 
-                for path in paths:
-                    try:
-                        response = client._connection.post(
-                            path,
-                            {
-                                "query": """
-                                {
-                                  Meta {
-                                    modules {
-                                      module
-                                      version
-                                    }
-                                  }
-                                }
-                                """
-                            }
-                        )
-                        
-                        if response.status_code == 200:
-                            data = response.json()
-                            logger.info(f"GraphQL Meta query result via {path}: {json.dumps(data, indent=2)}")
-                            break
-                        else:
-                            logger.warning(f"GraphQL query via {path} failed: {response.status_code} - {response.text}")
-                    except Exception as e:
-                        logger.error(f"Error with GraphQL query via {path}: {e}")
+                path, response = post_first_success(
+                    client,
+                    paths,
+                    META_GQL_QUERY
+                )
+                
+                if response is not None:
+                    data = response.json()
+                    logger.info("GraphQL Meta query result via %s: %s", path, LazyJson(data))
+                else:
+                    logger.warning("GraphQL query failed on all paths")
         except Exception as e:
             logger.error(f"Error using GraphQL: {e}")
         
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
     finally:
-        # Clean up
-        if client:
-            client.close()
+        # The shared client is closed at interpreter exit
         logger.info("Weaviate client API demonstration completed")
 
 
@@ -2,13 +2,14 @@
 
 import os
 import sys
-import time
 import uuid
 import logging
-import json
-from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from weaviate.classes.data import DataObject
+from config import settings
+from weaviate_client import cached_get_meta, get_client, response_json, wait_for_object_count
 
 # Set up logging
 logging.basicConfig(
@@ -24,11 +25,11 @@ logger = logging.getLogger("WeaviateCollectionsDemo")
 ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-# Load environment variables
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key or not openai_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL, WEAVIATE_API_KEY, or OPENAI_API_KEY")
@@ -37,47 +38,108 @@ if not weaviate_url or not weaviate_api_key or not openai_api_key:
 # Define the collection name for our demo
 COLLECTION_NAME = "AIArticles"
 
-def main():
+# GraphQL documents are built once; the search text is sent as a variable
+NEAR_TEXT_QUERY = """
+query($concepts: [String]!) {
+  Get {
+    %s(
+      nearText: {
+        concepts: $concepts
+        certainty: 0.7
+      }
+      limit: 2
+    ) {
+      title
+      content
+      category
+      _additional {
+        certainty
+      }
+    }
+  }
+}
+""" % COLLECTION_NAME
+
+GENERATE_QUERY = """
+query($concepts: [String]!) {
+  Get {
+    %s(
+      nearText: {
+        concepts: $concepts
+      }
+      limit: 1
+    ) {
+      title
+      content
+      _additional {
+        generate(
+          singleResult: {
+            prompt: "Explain this in simpler terms:"
+          }
+        ) {
+          singleResult
+          error
+        }
+      }
+    }
+  }
+}
+""" % COLLECTION_NAME
+
+# Maximum number of insert requests in flight at once
+MAX_CONCURRENT_INSERTS = 8
+
+# Objects per insert request, capped at OpenAI's 2048-input embedding limit
+BATCH_SIZE = min(int(os.getenv("WEAVIATE_BATCH_SIZE", "100")), 2048)
+
+
+def chunked(iterable, n):
+    """Yield successive lists of up to n items from iterable."""
+    it = iter(iterable)
+    while chunk := list(islice(it, n)):
+        yield chunk
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Demonstrate the Weaviate collections API")
+    parser.add_argument(
+        "--list-collections",
+        action="store_true",
+        help="list every collection on the cluster (downloads the full schema)"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Main function to demonstrate Weaviate collections API."""
+    args = parse_args(argv)
     logger.info("Starting Weaviate collections API demonstration")
     
-    client = None
-    
     try:
-        # Connect to Weaviate
-        # Ensure the URL has https:// prefix
-        if not weaviate_url.startswith('https://'):
-            weaviate_url = f"https://{weaviate_url}"
-            
-        logger.info(f"Connecting to Weaviate at {weaviate_url}")
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=weaviate_url,
-            auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-            headers={
-                "X-OpenAI-Api-Key": openai_api_key  # For OpenAI modules
-            }
-        )
+        # Connect to Weaviate through the shared, connection-pooled client
+        logger.info("Connecting to Weaviate at %s", weaviate_url)
+        client = get_client()
         
-        # Check if client is ready
-        is_ready = client.is_ready()
-        logger.info(f"Connection status: {is_ready}")
-        
-        if not is_ready:
-            logger.error("Weaviate client is not ready")
-            sys.exit(1)
+        # The startup probes are independent, so issue them concurrently
+        logger.info("Retrieving meta information and collections")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            meta_future = executor.submit(cached_get_meta, client)
+            collections_future = (
+                executor.submit(client._connection.get, "collections") if args.list_collections else None
+            )
+            exists_future = executor.submit(client.collections.exists, COLLECTION_NAME)
         
-        # Get meta information
-        logger.info("Retrieving meta information")
-        meta = client.get_meta()
+        meta = meta_future.result()
         
         # Print Weaviate version
         if 'version' in meta:
-            logger.info(f"Weaviate version: {meta['version']}")
+            logger.info("Weaviate version: %s", meta['version'])
         
         # Check available modules
         if 'modules' in meta:
             modules = meta['modules']
-            logger.info(f"Found {len(modules)} modules")
+            logger.info("Found %s modules", len(modules))
             
             # Check if the required OpenAI modules are available
             if 'text2vec-openai' in modules:
@@ -90,46 +152,38 @@ def main():
             else:
                 logger.warning("generative-openai module is not available")
         
-        # List collections using the collections API
-        logger.info("Listing collections")
-        response = client._connection.get("collections")
+        # List collections using the collections API (opt-in: the response carries every collection's schema)
+        if collections_future is not None:
+            logger.info("Listing collections")
+            response = collections_future.result()
         
-        if response.status_code == 200:
-            collections_data = response.json()
+            if response.status_code == 200:
+                collections_data = response_json(response)
             
-            if 'collections' in collections_data:
-                collections = collections_data['collections']
-                logger.info(f"Found {len(collections)} collections:")
+                if 'collections' in collections_data:
+                    collections = collections_data['collections']
+                    logger.info("Found %s collections:", len(collections))
                 
-                for collection in collections:
-                    if 'name' in collection:
-                        logger.info(f"  - {collection['name']}")
+                    for collection in collections:
+                        if 'name' in collection:
+                            logger.info("  - %s", collection['name'])
+                else:
+                    logger.info("No collections found")
             else:
-                logger.info("No collections found")
-        else:
-            logger.warning(f"Failed to list collections: {response.status_code} - {response.text}")
+                logger.warning("Failed to list collections: %s - %s", response.status_code, response.text)
         
         # Check if our collection exists and delete it if it does
-        logger.info(f"Checking if collection {COLLECTION_NAME} exists")
-        response = client._connection.get(f"collections/{COLLECTION_NAME}")
-        
-        if response.status_code == 200:
-            logger.info(f"Collection {COLLECTION_NAME} exists, deleting it")
-            delete_response = client._connection.delete(f"collections/{COLLECTION_NAME}")
-            
-            if delete_response.status_code == 200:
-                logger.info(f"Collection {COLLECTION_NAME} deleted successfully")
-            else:
-                logger.warning(f"Failed to delete collection: {delete_response.status_code} - {delete_response.text}")
-                # Wait a bit before trying to create the collection
-                time.sleep(1)
-        elif response.status_code == 404:
-            logger.info(f"Collection {COLLECTION_NAME} does not exist")
+        logger.info("Checking if collection %s exists", COLLECTION_NAME)
+        if exists_future.result():
+            logger.info("Collection %s exists, deleting it", COLLECTION_NAME)
+            # delete() returns once the server has confirmed the removal
+            client.collections.delete(COLLECTION_NAME)
+            logger.info("Collection %s deleted successfully", COLLECTION_NAME)
         else:
-            logger.warning(f"Unexpected response when checking collection: {response.status_code} - {response.text}")
+            logger.info("Collection %s does not exist", COLLECTION_NAME)
         
         # Create a new collection with text2vec-openai vectorizer
-        logger.info(f"Creating collection {COLLECTION_NAME} with text2vec-openai vectorizer")
+        logger.info("Creating collection %s with text2vec-openai vectorizer", COLLECTION_NAME)
         
         collection_obj = {
             "name": COLLECTION_NAME,
@@ -183,9 +237,9 @@ def main():
         response = client._connection.post("collections", collection_obj)
         
         if response.status_code == 200:
-            logger.info(f"Collection {COLLECTION_NAME} created successfully")
+            logger.info("Collection %s created successfully", COLLECTION_NAME)
         else:
-            logger.error(f"Failed to create collection: {response.status_code} - {response.text}")
+            logger.error("Failed to create collection: %s - %s", response.status_code, response.text)
             sys.exit(1)
         
         # Add sample data
@@ -209,133 +263,100 @@ def main():
             }
         ]
         
-        for idx, data in enumerate(sample_data):
-            logger.info(f"Adding article {idx+1}: {data['title']}")
-            
-            # Generate a UUID for the object
-            object_uuid = str(uuid.uuid4())
-            
-            # Add the data object
-            response = client._connection.post(
-                f"collections/{COLLECTION_NAME}/objects",
+        # Send the objects in BATCH_SIZE groups, one batch request per group
+        articles = client.collections.get(COLLECTION_NAME)
+        failed = 0
+        
+        # Build every payload up front so the insert threads only do network I/O.
+        # IDs come from the title, so a rerun overwrites rather than duplicates
+        payloads = [DataObject(properties=data, uuid=uuid.uuid5(uuid.NAMESPACE_URL, data["title"])) for data in sample_data]
+        chunks = list(chunked(payloads, BATCH_SIZE))
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_INSERTS) as executor:
+            results = list(executor.map(articles.data.insert_many, chunks))
+        
+        for chunk, result in zip(chunks, results):
+            if result.has_errors:
+                failed += len(result.errors)
+                first_error = next(iter(result.errors.values()))
+                logger.warning("Failed to add %s of %s articles: %s", len(result.errors), len(chunk), first_error.message)
+        
+        logger.info("Added %s of %s articles", len(sample_data) - failed, len(sample_data))
+        
+        # Wait until the inserted objects are visible
+        logger.info("Waiting for indexing to complete...")
+        wait_for_object_count(client, COLLECTION_NAME, len(sample_data) - failed)
+        
+        # The three demo requests are independent, so send them concurrently
+        search_query = "What are the ethical considerations in AI?"
+        generate_query = "What are vector databases?"
+        prompt = "Explain the concept of vector embeddings in AI in 3 sentences."
+        
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            search_future = executor.submit(
+                client._connection.post,
+                "graphql",
+                {"query": NEAR_TEXT_QUERY, "variables": {"concepts": [search_query]}}
+            )
+            generate_future = executor.submit(
+                client._connection.post,
+                "graphql",
+                {"query": GENERATE_QUERY, "variables": {"concepts": [generate_query]}}
+            )
+            standalone_future = executor.submit(
+                client._connection.post,
+                "modules/generative-openai/generate",
                 {
-                    "id": object_uuid,
-                    "properties": data
+                    "prompt": prompt
                 }
             )
-            
-            if response.status_code == 200:
-                logger.info(f"Article {idx+1} added successfully")
-            else:
-                logger.warning(f"Failed to add article {idx+1}: {response.status_code} - {response.text}")
-        
-        # Wait for indexing to complete
-        logger.info("Waiting for indexing to complete...")
-        time.sleep(2)
         
         # Perform a vector search
         logger.info("\n=== DEMONSTRATING VECTOR SEARCH WITH TEXT2VEC-OPENAI ===\n")
         
-        query = "What are the ethical considerations in AI?"
-        logger.info(f"Performing semantic search with query: '{query}'")
-        
-        search_response = client._connection.post(
-            "graphql",
-            {
-                "query": f"""
-                {{
-                  Get {{
-                    {COLLECTION_NAME}(
-                      nearText: {{
-                        concepts: ["{query}"]
-                        certainty: 0.7
-                      }}
-                      limit: 2
-                    ) {{
-                      title
-                      content
-                      category
-                      _additional {{
-                        certainty
-                      }}
-                    }}
-                  }}
-                }}
-                """
-            }
-        )
+        logger.info("Performing semantic search with query: '%s'", search_query)
+        search_response = search_future.result()
         
         if search_response.status_code == 200:
-            search_data = search_response.json()
+            search_data = response_json(search_response)
             
             if "data" in search_data and "Get" in search_data["data"] and COLLECTION_NAME in search_data["data"]["Get"]:
                 articles = search_data["data"]["Get"][COLLECTION_NAME]
-                logger.info(f"Found {len(articles)} relevant articles:")
-                
+                # One log record for the whole result list rather than two per article
+                lines = [f"Found {len(articles)} relevant articles:"]
                 for idx, article in enumerate(articles):
                     certainty = article["_additional"]["certainty"] if "_additional" in article and "certainty" in article["_additional"] else "N/A"
-                    logger.info(f"  {idx+1}. {article['title']} (Category: {article['category']}, Certainty: {certainty})")
-                    logger.info(f"     Content: {article['content'][:100]}...")
+                    lines.append(f"  {idx+1}. {article['title']} (Category: {article['category']}, Certainty: {certainty})")
+                    lines.append(f"     Content: {article['content'][:100]}...")
+                logger.info("\n".join(lines))
             else:
                 logger.warning("No results found or unexpected response structure")
         else:
-            logger.warning(f"Search failed: {search_response.status_code} - {search_response.text}")
+            logger.warning("Search failed: %s - %s", search_response.status_code, search_response.text)
         
         # Perform a generative query
         logger.info("\n=== DEMONSTRATING GENERATIVE AI WITH GENERATIVE-OPENAI ===\n")
         
-        query = "What are vector databases?"
-        logger.info(f"Performing generative search with query: '{query}'")
-        
-        generate_response = client._connection.post(
-            "graphql",
-            {
-                "query": f"""
-                {{
-                  Get {{
-                    {COLLECTION_NAME}(
-                      nearText: {{
-                        concepts: ["{query}"]
-                      }}
-                      limit: 1
-                    ) {{
-                      title
-                      content
-                      _additional {{
-                        generate(
-                          singleResult: {{
-                            prompt: "Explain this in simpler terms:"
-                          }}
-                        ) {{
-                          singleResult
-                          error
-                        }}
-                      }}
-                    }}
-                  }}
-                }}
-                """
-            }
-        )
+        logger.info("Performing generative search with query: '%s'", generate_query)
+        generate_response = generate_future.result()
         
         if generate_response.status_code == 200:
-            generate_data = generate_response.json()
+            generate_data = response_json(generate_response)
             
             if "data" in generate_data and "Get" in generate_data["data"] and COLLECTION_NAME in generate_data["data"]["Get"]:
                 articles = generate_data["data"]["Get"][COLLECTION_NAME]
                 
                 if articles:
                     article = articles[0]
-                    logger.info(f"Article: {article['title']}")
-                    logger.info(f"Original content: {article['content']}")
+                    logger.info("Article: %s", article['title'])
+                    logger.info("Original content: %s", article['content'])
                     
                     if "_additional" in article and "generate" in article["_additional"]:
                         generated = article["_additional"]["generate"]
                         
                         if "singleResult" in generated:
-                            logger.info(f"\nSimplified explanation: {generated['singleResult']}")
+                            logger.info("\nSimplified explanation: %s", generated['singleResult'])
                         elif "error" in generated:
-                            logger.error(f"Generation error: {generated['error']}")
+                            logger.error("Generation error: %s", generated['error'])
                     else:
                         logger.warning("No generated content found")
                 else:
@@ -343,37 +364,30 @@ def main():
             else:
                 logger.warning("No results found or unexpected response structure")
         else:
-            logger.warning(f"Generate query failed: {generate_response.status_code} - {generate_response.text}")
+            logger.warning("Generate query failed: %s - %s", generate_response.status_code, generate_response.text)
         
         # Use the standalone generative API
         logger.info("\n=== DEMONSTRATING STANDALONE GENERATIVE AI ===\n")
         
-        prompt = "Explain the concept of vector embeddings in AI in 3 sentences."
-        logger.info(f"Using generative-openai module with prompt: '{prompt}'")
-        
-        standalone_response = client._connection.post(
-            "modules/generative-openai/generate",
-            {
-                "prompt": prompt
-            }
-        )
+        logger.info("Using generative-openai module with prompt: '%s'", prompt)
+        standalone_response = standalone_future.result()
         
         if standalone_response.status_code == 200:
-            standalone_data = standalone_response.json()
+            standalone_data = response_json(standalone_response)
             
             if "result" in standalone_data:
-                logger.info(f"Generated response: {standalone_data['result']}")
+                logger.info("Generated response: %s", standalone_data['result'])
             else:
                 logger.warning("No result found in response")
         else:
-            logger.warning(f"Standalone generate failed: {standalone_response.status_code} - {standalone_response.text}")
+            logger.warning("Standalone generate failed: %s - %s", standalone_response.status_code, standalone_response.text)
         
     except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
+        logger.error("Unexpected error: %s", e)
+        # The traceback is only formatted when DEBUG logging is enabled
+        logger.debug("Unexpected error details", exc_info=True)
     finally:
-        # Clean up
-        if client:
-            client.close()
+        # The shared client is closed at interpreter exit
         logger.info("Weaviate collections API demonstration completed")
 
 
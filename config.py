@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+import os
+import functools
+from types import SimpleNamespace
+from dotenv import load_dotenv
+
+# Get the project root directory
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+@functools.lru_cache(maxsize=1)
+def settings() -> SimpleNamespace:
+    """Load the .env file once and return the connection settings."""
+    load_dotenv(os.path.join(ROOT, '.env'))
+    return SimpleNamespace(
+        weaviate_url=os.getenv("WEAVIATE_URL"),
+        weaviate_api_key=os.getenv("WEAVIATE_API_KEY"),
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        rest_endpoint=os.getenv("REST_ENDPOINT"),
+        grpc_endpoint=os.getenv("GRPC_ENDPOINT")
+    )
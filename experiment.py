@@ -3,78 +3,105 @@
 import os
 import sys
 import logging
-import json
-import time
 import uuid
-from typing import Dict, List, Any, Optional
-from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Dict, Any, Optional, Sequence
+from weaviate.classes.config import ConsistencyLevel
+from weaviate.classes.data import DataObject
 from weaviate.exceptions import WeaviateQueryError, WeaviateConnectionError
-
-# Import the available modules - these need to be imported as weaviate.module
-# Based on the screenshot, these are the modules available in Weaviate Cloud
+from config import settings
+from avail_modules import (
+    GENERATIVE_MODULES,
+    MODULE_PREFIXES,
+    MULTI2VEC_MODULES,
+    QNA_MODULES,
+    REF2VEC_MODULES,
+    RERANKER_MODULES,
+    TEXT2COLBERT_MODULES,
+    TEXT2VEC_MODULES
+)
+from log_utils import LazyJson, queued_handler
+from weaviate_client import RateLimiter, cached_get_meta, get_client
 
 # Get the project root directory
 ROOT = os.path.abspath(os.path.dirname(__file__))
-sys.path.append(ROOT)
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(os.path.join(ROOT, "experiment.log")),
-        logging.StreamHandler()
+        # File and console writes happen off the calling thread
+        queued_handler(
+            logging.FileHandler(os.path.join(ROOT, "experiment.log")),
+            logging.StreamHandler()
+        )
     ]
 )
 logger = logging.getLogger("WeaviateExperiment")
 
-# Load environment variables
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL or WEAVIATE_API_KEY")
     sys.exit(1)
 
-# Define available modules based on the screenshot
-GENERATIVE_MODULES = [
-    "generative-anthropic", "generative-anyscale", "generative-aws", "generative-cohere",
-    "generative-databricks", "generative-friendliai", "generative-mistral", "generative-nvidia",
-    "generative-octoai", "generative-ollama", "generative-openai", "generative-palm", "generative-xai"
-]
+# Rows loaded into the test collection
+TEST_DATA = (
+    {
+        "title": "Artificial Intelligence",
+        "content": "Artificial intelligence is the simulation of human intelligence processes by machines."
+    },
+    {
+        "title": "Machine Learning",
+        "content": "Machine learning is a method of data analysis that automates analytical model building."
+    },
+    {
+        "title": "Vector Databases",
+        "content": "Vector databases store data as high-dimensional vectors, enabling efficient similarity search."
+    }
+)
 
-MULTI2VEC_MODULES = [
-    "multi2vec-cohere", "multi2vec-jinaai", "multi2vec-nvidia", "multi2vec-palm", "multi2vec-voyageai"
+# Insert payloads with UUIDs derived from the titles, built once at import
+TEST_OBJECTS = [
+    DataObject(properties=data, uuid=uuid.uuid5(uuid.NAMESPACE_URL, data["title"]))
+    for data in TEST_DATA
 ]
 
-QNA_MODULES = ["qna-openai"]
-
-REF2VEC_MODULES = ["ref2vec-centroid"]
+# Vectorizer used for the collection behind generative module tests
+GENERATIVE_TEST_VECTORIZER = "text2vec-openai"
 
-RERANKER_MODULES = [
-    "reranker-cohere", "reranker-jinaai", "reranker-nvidia", "reranker-voyageai"
-]
+# Upper bound on module tests running at once against the shared collection
+MAX_CONCURRENT_TESTS = 4
 
-TEXT2COLBERT_MODULES = ["text2colbert-jinaai"]
+# nearText query and returned properties for vectorizer tests
+VECTORIZER_TEST_QUERY = "What is AI?"
+TEST_RETURN_PROPERTIES = ["title", "content"]
 
-TEXT2VEC_MODULES = [
-    "text2vec-aws", "text2vec-cohere", "text2vec-databricks", "text2vec-huggingface",
-    "text2vec-jinaai", "text2vec-mistral", "text2vec-nvidia", "text2vec-octoai",
-    "text2vec-ollama", "text2vec-openai", "text2vec-palm", "text2vec-voyageai", "text2vec-weaviate"
-]
+# Module tests started per second; short bursts go through immediately
+TESTS_PER_SECOND = 3
 
 
 class WeaviateExperiment:
     """Class to experiment with Weaviate modules and their capabilities."""
     
-    def __init__(self):
-        """Initialize the Weaviate client and experiment setup."""
+    def __init__(self, batch_size: int = 100):
+        """Initialize the Weaviate client and experiment setup.
+        
+        Args:
+            batch_size: Number of objects sent per insert_many request.
+        """
         self.client = None
         self.class_name = "ModuleTest"
+        self.batch_size = batch_size
+        self._current_schema_sig = None
+        self._data_loaded: set[tuple[str, str]] = set()
+        self._test_limiter = RateLimiter(max_rate=TESTS_PER_SECOND, time_period=1)
         self.connect_to_weaviate()
         
     def connect_to_weaviate(self) -> None:
@@ -82,23 +109,9 @@ class WeaviateExperiment:
         try:
             logger.info(f"Connecting to Weaviate at {weaviate_url}")
             
-            # Connect to Weaviate using the client API with v4 syntax
-            self.client = weaviate.connect_to_weaviate_cloud(
-                cluster_url=weaviate_url,
-                auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-                headers={
-                    "X-OpenAI-Api-Key": openai_api_key  # For OpenAI modules
-                }
-            )
-            
-            # Check if client is ready
-            is_ready = self.client.is_ready()
-            logger.info(f"Connection status: {is_ready}")
+            # Reuse the process-wide client (readiness is checked on first connect)
+            self.client = get_client()
             
-            if not is_ready:
-                logger.error("Weaviate client is not ready")
-                sys.exit(1)
-                
         except Exception as e:
             logger.error(f"Error connecting to Weaviate: {e}")
             sys.exit(1)
@@ -109,13 +122,13 @@ class WeaviateExperiment:
             logger.info("Closing Weaviate connection")
             self.client.close()
     
-    def get_available_modules(self) -> Dict[str, List[str]]:
+    def get_available_modules(self) -> Dict[str, Sequence[str]]:
         """Get all available modules from the Weaviate instance."""
         try:
             logger.info("Retrieving available modules from Weaviate")
             
             # Get meta information using the client API
-            meta = self.client.get_meta()
+            meta = cached_get_meta(self.client)
             
             # Extract modules from meta response
             modules = []
@@ -124,7 +137,7 @@ class WeaviateExperiment:
                 logger.info(f"Found {len(modules)} modules: {', '.join(modules)}")
             else:
                 logger.warning("No modules found in Weaviate meta information, using predefined modules")
-                # Use the predefined modules from the top of the file
+                # Use the predefined modules from avail_modules
                 logger.info(f"Using predefined modules")
                 
                 # Return predefined module groups
@@ -136,27 +149,15 @@ class WeaviateExperiment:
                     "reranker": RERANKER_MODULES,
                     "text2colbert": TEXT2COLBERT_MODULES,
                     "text2vec": TEXT2VEC_MODULES,
-                    "other": []
+                    "other": ()
                 }
             
             # Group modules by type
-            module_groups = {
-                "generative": [],
-                "multi2vec": [],
-                "qna": [],
-                "ref2vec": [],
-                "reranker": [],
-                "text2colbert": [],
-                "text2vec": [],
-                "other": []
-            }
+            module_groups = {}
             
             for module_name in modules:
-                prefix = module_name.split('-')[0] if '-' in module_name else "other"
-                if prefix in module_groups:
-                    module_groups[prefix].append(module_name)
-                else:
-                    module_groups["other"].append(module_name)
+                prefix = module_name.partition('-')[0]
+                module_groups.setdefault(prefix if prefix in MODULE_PREFIXES else "other", []).append(module_name)
             
             return module_groups
         except Exception as e:
@@ -167,16 +168,22 @@ class WeaviateExperiment:
                 "text2vec": TEXT2VEC_MODULES[:2]     # Just use a couple for testing
             }
     
-    def create_test_schema(self, vectorizer: str) -> None:
-        """Create a test schema with the specified vectorizer."""
+    def create_test_schema(self, vectorizer: str) -> bool:
+        """Create a test schema with the specified vectorizer.
+        
+        Returns True if the class was (re)created, False if the class this
+        experiment created last already uses the vectorizer and was reused.
+        """
+        schema_sig = (self.class_name, vectorizer)
+        if schema_sig == self._current_schema_sig:
+            logger.info(f"Reusing schema {self.class_name} with vectorizer: {vectorizer}")
+            return False
+        
         try:
             # Check if class already exists and delete it
-            schema = self.client.schema.get()
-            classes = [cls['class'] for cls in schema['classes']] if 'classes' in schema else []
-            
-            if self.class_name in classes:
+            if self.client.collections.exists(self.class_name):
                 logger.info(f"Deleting existing class: {self.class_name}")
-                self.client.schema.delete_class(self.class_name)
+                self.client.collections.delete(self.class_name)
             
             # Create class with specified vectorizer
             logger.info(f"Creating schema with vectorizer: {vectorizer}")
@@ -201,49 +208,43 @@ class WeaviateExperiment:
             }
             
             # Create the class
-            self.client.schema.create_class(class_obj)
+            self.client.collections.create_from_dict(class_obj)
+            self._current_schema_sig = schema_sig
+            self._data_loaded.discard(schema_sig)
             logger.info(f"Schema created successfully: {self.class_name}")
             
         except Exception as e:
+            self._current_schema_sig = None
             logger.error(f"Error creating schema: {e}")
+        
+        return True
     
     def add_test_data(self) -> None:
-        """Add test data to the collection."""
+        """Add test data to the collection.
+        
+        Does nothing if the data is already loaded into the current schema.
+        Object UUIDs are derived from the titles, so repeated inserts of the
+        same rows overwrite the same objects instead of creating duplicates.
+        """
+        if self._current_schema_sig in self._data_loaded:
+            logger.info(f"Test data already loaded into {self.class_name}")
+            return
+        
         try:
-            test_data = [
-                {
-                    "title": "Artificial Intelligence",
-                    "content": "Artificial intelligence is the simulation of human intelligence processes by machines."
-                },
-                {
-                    "title": "Machine Learning",
-                    "content": "Machine learning is a method of data analysis that automates analytical model building."
-                },
-                {
-                    "title": "Vector Databases",
-                    "content": "Vector databases store data as high-dimensional vectors, enabling efficient similarity search."
-                }
-            ]
+            objects = TEST_OBJECTS
+            logger.info(f"Adding {len(objects)} test objects to {self.class_name}")
             
-            logger.info(f"Adding {len(test_data)} test objects to {self.class_name}")
+            # Insert the objects in batch_size groups, one round trip per group
+            collection = self.client.collections.get(self.class_name).with_consistency_level(ConsistencyLevel.ONE)
             
-            # Use batch processing to add data
-            with self.client.batch as batch:
-                batch.batch_size = 10
+            for start in range(0, len(objects), self.batch_size):
+                result = collection.data.insert_many(objects[start:start + self.batch_size])
                 
-                for idx, data in enumerate(test_data):
-                    logger.info(f"Adding object {idx+1}: {data['title']}")
-                    
-                    # Generate a UUID for the object
-                    object_uuid = str(uuid.uuid4())
-                    
-                    # Add the data object to the batch
-                    batch.add_data_object(
-                        data_object=data,
-                        class_name=self.class_name,
-                        uuid=object_uuid
-                    )
+                if result.has_errors:
+                    logger.warning("Failed to add %d test objects", len(result.errors))
             
+            if self._current_schema_sig is not None:
+                self._data_loaded.add(self._current_schema_sig)
             logger.info("Test data added successfully")
             
         except Exception as e:
@@ -254,33 +255,31 @@ class WeaviateExperiment:
         try:
             logger.info(f"Testing vectorizer: {vectorizer}")
             
-            # Create schema with this vectorizer
-            self.create_test_schema(vectorizer)
-            
-            # Add test data
-            self.add_test_data()
+            # Create schema with this vectorizer; a reused schema already holds the test data
+            if self.create_test_schema(vectorizer):
+                self.add_test_data()
             
             # Perform a vector search
-            query = "What is AI?"
-            logger.info(f"Performing vector search with query: '{query}'")
+            logger.info(f"Performing vector search with query: '{VECTORIZER_TEST_QUERY}'")
             
-            # Use GraphQL to perform a nearText search
-            result = self.client.query.get(
-                self.class_name, ["title", "content"]
-            ).with_near_text({
-                "concepts": [query]
-            }).with_limit(2).do()
+            # nearText search over gRPC
+            collection = self.client.collections.get(self.class_name)
+            result = collection.query.near_text(
+                query=VECTORIZER_TEST_QUERY,
+                limit=2,
+                return_properties=TEST_RETURN_PROPERTIES
+            )
             
             # Process and log results
-            if "data" in result and "Get" in result["data"]:
-                objects = result["data"]["Get"][self.class_name]
-                logger.info(f"Found {len(objects)} results")
+            if result.objects:
+                logger.info(f"Found {len(result.objects)} results")
                 
-                for idx, obj in enumerate(objects):
-                    logger.info(f"Result {idx+1}: {obj['title']} - {obj['content'][:50]}...")
+                log = logger.info
+                for idx, obj in enumerate(result.objects, 1):
+                    properties = obj.properties
+                    log("Result %d: %s - %.50s...", idx, properties['title'], properties['content'])
             else:
-                logger.warning(f"No results found or unexpected response structure")
-                logger.debug(f"Response: {json.dumps(result, indent=2)}")
+                logger.warning(f"No results found")
             
         except Exception as e:
             logger.error(f"Error testing vectorizer {vectorizer}: {e}")
@@ -291,11 +290,9 @@ class WeaviateExperiment:
             logger.info(f"Testing generative module: {module}")
             
             # Create schema with text2vec-openai as the vectorizer
-            vectorizer = "text2vec-openai"
-            self.create_test_schema(vectorizer)
-            
-            # Add test data
-            self.add_test_data()
+            vectorizer = GENERATIVE_TEST_VECTORIZER
+            if self.create_test_schema(vectorizer):
+                self.add_test_data()
             
             # Perform a generative query
             logger.info(f"Performing generative query with {module}")
@@ -322,16 +319,21 @@ class WeaviateExperiment:
                 for idx, obj in enumerate(objects):
                     if "_additional" in obj and "generate" in obj["_additional"]:
                         generated_text = obj["_additional"]["generate"]["singleResult"]
-                        logger.info(f"Generated summary for '{obj['title']}': {generated_text}")
+                        logger.info("Generated summary for '%s': %s", obj['title'], generated_text)
                     else:
-                        logger.warning(f"No generated text for {obj['title']}")
+                        logger.warning("No generated text for %s", obj['title'])
             else:
                 logger.warning(f"No results found or unexpected response structure")
-                logger.debug(f"Response: {json.dumps(result, indent=2)}")
+                logger.debug("Response: %s", LazyJson(result))
             
         except Exception as e:
             logger.error(f"Error testing generative module {module}: {e}")
     
+    def _run_limited(self, test, module: str) -> None:
+        """Run a module test once the test rate limiter lets it start."""
+        with self._test_limiter:
+            test(module)
+    
     def run_module_tests(self) -> None:
         """Run tests for different module types."""
         # Get available modules
@@ -341,7 +343,7 @@ class WeaviateExperiment:
         logger.info("Available modules by category:")
         for category, modules in available_modules.items():
             if modules:
-                logger.info(f"  {category}: {', '.join(modules)}")
+                logger.info("  %s: %s", category, ', '.join(modules))
         
         # Test text vectorizers - just test one to save time
         # Prefer text2vec-openai if available, otherwise use the first one
@@ -352,11 +354,6 @@ class WeaviateExperiment:
             else:
                 test_vectorizers = [available_modules["text2vec"][0]]
         
-        for vectorizer in test_vectorizers:
-            logger.info(f"\n{'='*50}\nTesting text vectorizer: {vectorizer}\n{'='*50}")
-            self.test_vectorizer(vectorizer)
-            time.sleep(1)  # Pause between tests
-        
         # Test generative modules - just test one to save time
         # Prefer generative-openai if available, otherwise use the first one
         test_generative = []
@@ -366,10 +363,26 @@ class WeaviateExperiment:
             else:
                 test_generative = [available_modules["generative"][0]]
         
-        for gen_module in test_generative:
-            logger.info(f"\n{'='*50}\nTesting generative module: {gen_module}\n{'='*50}")
-            self.test_generative_module(gen_module)
-            time.sleep(1)  # Pause between tests
+        # Each test is (vectorizer its collection needs, label, test method, module under test)
+        tests = [(vectorizer, "text vectorizer", self.test_vectorizer, vectorizer) for vectorizer in test_vectorizers]
+        tests += [(GENERATIVE_TEST_VECTORIZER, "generative module", self.test_generative_module, module)
+                  for module in test_generative]
+        tests.sort(key=lambda test: test[0])
+        
+        # All tests share one collection, so tests needing the same vectorizer run
+        # concurrently once its schema is in place; vectorizer changes run in turn
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TESTS) as executor:
+            for vectorizer, group in groupby(tests, key=lambda test: test[0]):
+                if self.create_test_schema(vectorizer):
+                    self.add_test_data()
+                
+                futures = []
+                for _, label, test, module in group:
+                    logger.info("\n%s\nTesting %s: %s\n%s", '=' * 50, label, module, '=' * 50)
+                    futures.append(executor.submit(self._run_limited, test, module))
+                
+                for future in futures:
+                    future.result()
         
         logger.info("\nModule testing completed. To test more modules, edit the run_module_tests method.")
 
@@ -389,12 +402,12 @@ def main():
         
     except KeyboardInterrupt:
         logger.info("Experiment interrupted by user")
+        if experiment:
+            experiment.close_connection()
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
     finally:
-        # Clean up
-        if experiment:
-            experiment.close_connection()
+        # The shared client is otherwise closed at interpreter exit
         logger.info("Weaviate module experiments completed")
 
 
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 
-import os
 import sys
 import logging
-import json
-from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+from avail_modules import MODULE_PREFIXES
+from log_utils import LazyJson
+from weaviate_client import cached_get_meta, get_client, probe_first_success
 
 # Set up logging
 logging.basicConfig(
@@ -18,20 +18,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger("WeaviateModulesExplorer")
 
-# Get the project root directory
-ROOT = os.path.abspath(os.path.dirname(__file__))
-sys.path.append(ROOT)
-
-# Load environment variables from .env file
-load_dotenv(os.path.join(ROOT, '.env'))
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL or WEAVIATE_API_KEY")
     sys.exit(1)
 
+# Candidate API paths for the schema and GraphQL probes
+SCHEMA_PATHS = [
+    "v1/schema",
+    "schema",
+    "v1/collections",
+    "collections"
+]
+GRAPHQL_PATHS = [
+    "v1/graphql",
+    "graphql"
+]
+
+# GraphQL payload for the module meta probe
+META_GQL_QUERY = {
+    "query": """
+    {
+      Meta {
+        modules {
+          module
+          version
+        }
+      }
+    }
+    """
+}
+
 
 def main():
     """Main function to explore Weaviate modules."""
@@ -45,28 +67,22 @@ def main():
     logger.info(f"Connecting to Weaviate at {weaviate_url}")
     
     try:
-        # Connect to Weaviate
-        headers = {}
-        if openai_api_key:
-            headers["X-OpenAI-Api-Key"] = openai_api_key
+        # Connect to Weaviate through the process-wide client
+        client = get_client()
         
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=weaviate_url,
-            auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-            headers=headers
-        )
-        
-        # Check if client is ready
-        is_ready = client.is_ready()
-        logger.info(f"Connection status: {is_ready}")
+        # Meta, schema and GraphQL lookups are independent, so issue them all at
+        # once; the schema and GraphQL probes try their paths at once (or just
+        # the one that worked last run)
+        logger.info("Retrieving meta information")
+        logger.info(f"Trying to get schema via {', '.join(SCHEMA_PATHS)}")
+        logger.info(f"Trying GraphQL query via {', '.join(GRAPHQL_PATHS)}")
         
-        if not is_ready:
-            logger.error("Weaviate client is not ready")
-            sys.exit(1)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            meta_future = executor.submit(cached_get_meta, client)
+            schema_future = executor.submit(probe_first_success, client, "schema", SCHEMA_PATHS)
+            graphql_future = executor.submit(probe_first_success, client, "graphql", GRAPHQL_PATHS, META_GQL_QUERY)
         
-        # Get meta information
-        logger.info("Retrieving meta information")
-        meta = client.get_meta()
+        meta = meta_future.result()
         
         # Print Weaviate version
         if 'version' in meta:
@@ -81,86 +97,44 @@ def main():
             module_groups = {}
             
             for module_name in modules:
-                prefix = module_name.split('-')[0] if '-' in module_name else "other"
-                if prefix not in module_groups:
-                    module_groups[prefix] = []
-                module_groups[prefix].append(module_name)
+                prefix = module_name.partition('-')[0]
+                module_groups.setdefault(prefix if prefix in MODULE_PREFIXES else "other", []).append(module_name)
             
             # Print modules by group
             for group, group_modules in sorted(module_groups.items()):
-                logger.info(f"\n=== {group.upper()} MODULES ===")
+                logger.info("\n=== %s MODULES ===", group.upper())
                 for module in sorted(group_modules):
-                    logger.info(f"  - {module}")
+                    logger.info("  - %s", module)
                     
                     # Print module details if available
                     if modules[module]:
-                        logger.info(f"    Details: {json.dumps(modules[module], indent=2)}")
+                        logger.info("    Details: %s", LazyJson(modules[module]))
         else:
             logger.warning("No modules found in Weaviate meta information")
         
         # Try to get schema information
         logger.info("\n=== TRYING TO EXPLORE SCHEMA ===")
         
-        # Try different API paths for schema
-        api_paths = [
-            "v1/schema",
-            "schema",
-            "v1/collections",
-            "collections"
-        ]
+        path, response = schema_future.result()
         
-        for path in api_paths:
-            try:
-                logger.info(f"Trying to get schema via {path}")
-                response = client._connection.get(path)
-                
-                if response.status_code == 200:
-                    logger.info(f"Successfully retrieved schema via {path}")
-                    schema_data = response.json()
-                    logger.info(f"Schema data: {json.dumps(schema_data, indent=2)[:500]}...")  # Truncate for readability
-                    break
-                else:
-                    logger.warning(f"Failed to get schema via {path}: {response.status_code} - {response.text}")
-            except Exception as e:
-                logger.error(f"Error getting schema via {path}: {e}")
+        if response is not None:
+            logger.info(f"Successfully retrieved schema via {path}")
+            schema_data = response.json()
+            logger.info("Schema data: %s", LazyJson(schema_data, limit=500))  # Truncate for readability
+        else:
+            logger.warning("Failed to get schema on all API paths")
         
         # Try to use GraphQL API
         logger.info("\n=== TRYING GRAPHQL META QUERY ===")
         
-        # Try different API paths for GraphQL
-        graphql_paths = [
-            "v1/graphql",
-            "graphql"
-        ]
+        path, response = graphql_future.result()
         
-        for path in graphql_paths:
-            try:
-                logger.info(f"Trying GraphQL query via {path}")
-                response = client._connection.post(
-                    path,
-                    {
-                        "query": """
-                        {
-                          Meta {
-                            modules {
-                              module
-                              version
-                            }
-                          }
-                        }
-                        """
-                    }
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"Successfully executed GraphQL query via {path}")
-                    graphql_data = response.json()
-                    logger.info(f"GraphQL data: {json.dumps(graphql_data, indent=2)}")
-                    break
-                else:
-                    logger.warning(f"Failed to execute GraphQL query via {path}: {response.status_code} - {response.text}")
-            except Exception as e:
-                logger.error(f"Error executing GraphQL query via {path}: {e}")
+        if response is not None:
+            logger.info(f"Successfully executed GraphQL query via {path}")
+            graphql_data = response.json()
+            logger.info("GraphQL data: %s", LazyJson(graphql_data))
+        else:
+            logger.warning("Failed to execute GraphQL query on all API paths")
         
         # Print summary of OpenAI modules
         logger.info("\n=== OPENAI MODULES SUMMARY ===")
@@ -170,11 +144,11 @@ def main():
         if openai_modules:
             logger.info(f"Found {len(openai_modules)} OpenAI modules:")
             for module in sorted(openai_modules):
-                logger.info(f"  - {module}")
+                logger.info("  - %s", module)
                 
                 # Print module details if available
                 if modules[module]:
-                    logger.info(f"    Details: {json.dumps(modules[module], indent=2)}")
+                    logger.info("    Details: %s", LazyJson(modules[module]))
         else:
             logger.warning("No OpenAI modules found")
         
@@ -260,9 +234,7 @@ def main():
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
     finally:
-        # Clean up
-        if 'client' in locals() and client:
-            client.close()
+        # The shared client is closed at interpreter exit
         logger.info("Weaviate modules exploration completed")
 
 
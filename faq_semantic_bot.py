@@ -2,15 +2,23 @@
 
 import os
 import sys
-import time
+import json
 import uuid
+import argparse
 import logging
-from dotenv import load_dotenv
+from config import settings
+import httpx
+import openai
 import weaviate
-from weaviate.auth import AuthApiKey
 import tracemalloc
+from semantic_cache import SemanticCache, VectorMatrix, embed_texts, local_embedder
+from weaviate_client import batch_import, get_client, near_search
+
+try:
+    import h2
+except ImportError:  # h2 is optional; without it httpx speaks HTTP/1.1
+    h2 = None
 
-tracemalloc.start()
 # Logging setup
 logging.basicConfig(
     level=logging.INFO,
@@ -19,18 +27,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger("FAQSemanticBot")
 
-# Load env variables
-ROOT = os.path.abspath(os.path.dirname(__file__))
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key or not openai_api_key:
     logger.error("Missing required environment variables.")
     sys.exit(1)
 
+# One OpenAI client for the whole session; its keep-alive pool lets
+# successive calls skip the TLS handshake, and with HTTP/2 concurrent
+# requests share a connection instead of opening one each
+_OPENAI = openai.OpenAI(
+    api_key=openai_api_key,
+    max_retries=3,
+    timeout=30.0,
+    http_client=httpx.Client(
+        http2=h2 is not None,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16)
+    )
+)
+
 COLLECTION = "FAQ"
+# Weaviate reads {name} in a generative prompt as a property placeholder
+_NO_BRACES = str.maketrans("{}", "()")
+# Below this many FAQs, search an in-memory embedding matrix instead of Weaviate
+LOCAL_SEARCH_MAX_ROWS = 256
+HNSW_CONFIG = {"ef": 32, "efConstruction": 64, "maxConnections": 16, "distance": "cosine", "skip": False}
 
 FAQ_DATA = [
     {
@@ -60,25 +85,11 @@ FAQ_DATA = [
     }
 ]
 
-def connect() -> weaviate.Client | None:
-    import weaviate
-    from weaviate.auth import AuthApiKey
-
-    if not weaviate_url.startswith('https://'):
-        url = f"https://{weaviate_url}"
-    else:
-        url = weaviate_url
-
+def connect() -> weaviate.WeaviateClient | None:
+    # The shared v4 client sends queries over gRPC
     try:
-        client = weaviate.Client(
-            url=url,
-            auth_client_secret=AuthApiKey(api_key=weaviate_api_key),
-            additional_headers={"X-OpenAI-Api-Key": openai_api_key}
-        )
-        logger.info(f"Weaviate client base_url: {url}")
-        if not client.is_ready():
-            logger.error("Weaviate client is not ready.")
-            sys.exit(1)
+        client = get_client()
+        logger.info(f"Weaviate client cluster_url: {weaviate_url}")
         return client
     except Exception as exc:
         logger.error(f"Error connecting to Weaviate Cloud: {exc}")
@@ -86,23 +97,21 @@ def connect() -> weaviate.Client | None:
 
 
 def setup_collection(client):
-    # Delete class if it exists
+    # Delete class if it exists; deleting a missing collection is a no-op,
+    # so there is no need to ask first
     try:
-        if hasattr(client, "schema") and hasattr(client.schema, "delete_class"):
-            schema = client.schema.get()
-            if any(cls['class'] == COLLECTION for cls in schema.get('classes', [])):
-                client.schema.delete_class(COLLECTION)
-                time.sleep(1)
-        else:
-            logger.error("client.schema interface not available. Update Weaviate client.")
-            sys.exit(1)
+        client.collections.delete(COLLECTION)
     except Exception as exc:
-        logger.warning(f"Could not check/delete class: {exc}")
+        logger.warning(f"Could not delete class: {exc}")
     # Create class
     class_obj = {
         "class": COLLECTION,
         "description": "Product FAQ entries",
-        "vectorizer": "text2vec-openai",
+        # FAQs and queries are embedded in-process when sentence-transformers is installed
+        "vectorizer": "none" if local_embedder() is not None else "text2vec-openai",
+        # Searches only ask for the top hit, so a small ef keeps full recall with less graph traversal
+        "vectorIndexType": "hnsw",
+        "vectorIndexConfig": HNSW_CONFIG,
         "moduleConfig": {
             "text2vec-openai": {"model": "text-embedding-3-small", "type": "text"},
             "generative-openai": {"model": "gpt-4o"}
@@ -114,48 +123,95 @@ def setup_collection(client):
         ]
     }
     try:
-        client.schema.create_class(class_obj)
+        client.collections.create_from_dict(class_obj)
     except Exception as exc:
         logger.warning(f"Failed to create class: {exc}")
     logger.info("Collection created.")
 
+def _log_ingest_error(properties, message):
+    """Log an object the server rejected."""
+    logger.warning(f"Failed to ingest: {properties.get('question')} ({message})")
+
+
 def ingest_faqs(client):
-    for faq in FAQ_DATA:
-        obj_id = str(uuid.uuid4())
-        try:
-            client.data_object.create(faq, COLLECTION, uuid=obj_id)
-        except Exception as exc:
-            logger.warning(f"Failed to ingest: {faq['question']} ({exc})")
+    model = local_embedder()
+    if model is not None:
+        vectors = model.encode([faq["question"] for faq in FAQ_DATA], batch_size=64, normalize_embeddings=True).tolist()
+    else:
+        vectors = [None] * len(FAQ_DATA)
+    # One batched request per flush; text2vec-openai embeds the whole batch at once.
+    # Rate-limited objects are retried with fewer concurrent requests after a backoff.
+    batch_import(
+        client,
+        COLLECTION,
+        ((faq, uuid.uuid4(), vector) for faq, vector in zip(FAQ_DATA, vectors)),
+        on_error=_log_ingest_error,
+        batch_size=64,
+        concurrent_requests=2
+    )
+    # The batch is flushed and waited on, so objects are searchable now
     logger.info("All FAQs ingested.")
-    time.sleep(2)  # Wait for indexing
 
 def semantic_search(client, user_q):
-    q = f"""
-    {{
-      Get {{
-        {COLLECTION}(
-          nearText: {{ concepts: [\"{user_q}\"] }}
-          limit: 1
-        ) {{
-          question
-          answer
-          category
-          _additional {{ certainty }}
-        }}
-      }}
-    }}
-    """
-    resp = client._connection.post("/graphql", {"query": q})
-    if resp.status_code == 200:
-        data = resp.json()
-        faqs = data.get("data", {}).get("Get", {}).get(COLLECTION, [])
-        if faqs:
-            return faqs[0]
+    # nearText (or nearVector with a local embedding) over gRPC; the question is
+    # passed as data, not spliced into a query string
+    res = near_search(
+        client.collections.get(COLLECTION).query,
+        user_q,
+        limit=1,
+        # No return_metadata: nothing reads the certainty, so don't ask Weaviate to compute and send it
+        return_properties=["question", "answer", "category"]
+    )
+    if res.objects:
+        return res.objects[0].properties
     return None
 
+def search_and_generate(client, user_q):
+    """Find the closest FAQ and write the answer in one Weaviate request.
+
+    generative-openai fills {question} and {answer} from the retrieved FAQ
+    server-side; returns (faq, answer), either of which may be None.
+    """
+    prompt = (
+        f"A user asked: '{user_q.translate(_NO_BRACES)}'.\n"
+        "The closest FAQ question is: '{question}'.\n"
+        "The official answer is: '{answer}'.\n\n"
+        "Write a concise, friendly answer for the user, referencing the official FAQ answer but in your own words."
+    )
+    try:
+        res = near_search(
+            client.collections.get(COLLECTION).generate,
+            user_q,
+            limit=1,
+            single_prompt=prompt,
+            return_properties=["question", "answer", "category"]
+        )
+    except Exception as exc:
+        logger.warning(f"Generative search failed, searching without it: {exc}")
+        return semantic_search(client, user_q), None
+    if not res.objects:
+        return None, None
+    obj = res.objects[0]
+    return obj.properties, (obj.generated or "").strip() or None
+
+def build_local_index(openai_client) -> VectorMatrix | None:
+    """Embed every FAQ question once; None if embedding fails."""
+    try:
+        return VectorMatrix(embed_texts(openai_client, [faq["question"] for faq in FAQ_DATA]))
+    except Exception as exc:
+        logger.warning(f"Could not embed FAQs locally, using Weaviate: {exc}")
+        return None
+
+def local_search(index: VectorMatrix, vector):
+    if vector is None:
+        return None
+    _, best = index.best_match(vector)
+    return FAQ_DATA[best]
+
 def generate_answer(
     user_q: str,
     faq: dict,
+    stream: bool = False,
 ):
     """Generate a friendly answer using OpenAI directly.
 
@@ -165,10 +221,9 @@ def generate_answer(
         The user's raw question.
     faq : dict
         The FAQ entry returned by semantic_search.
+    stream : bool
+        Print the answer token by token as it is generated.
     """
-    import openai
-    openai.api_key = openai_api_key
-    openai_client = openai.OpenAI()
     models = ["gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"]
     prompt = (
         f"A user asked: '{user_q}'.\n"
@@ -178,45 +233,131 @@ def generate_answer(
     )
 
     for model in models:
+        parts = []
         try:
-            response = openai_client.chat.completions.create(
+            response = _OPENAI.chat.completions.create(
                 model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.7,
                 max_tokens=256,
+                stream=stream,
             )
-            return response.choices[0].message.content.strip()
+            if not stream:
+                return response.choices[0].message.content.strip()
+            for chunk in response:
+                if chunk.choices and (text := chunk.choices[0].delta.content):
+                    print(text, end="", flush=True)
+                    parts.append(text)
+            return "".join(parts).strip() or None
         except Exception as exc:
             logger.error(f"OpenAI generation failed with model {model}: {exc}")
+            # Part of the answer is already on screen, so don't start over with another model
+            if parts:
+                return None
     return None
 
-def main():
+def generate_answers_batch(pairs: list[tuple[str, dict]]) -> list[str | None]:
+    """Answer several (question, FAQ) pairs with a single chat completion.
+
+    One request for N questions stays well under the requests-per-minute cap;
+    if the reply cannot be parsed, each pair falls back to generate_answer.
+    """
+    if not pairs:
+        return []
+    items = "\n\n".join(
+        f"{number}. A user asked: '{user_q}'.\n"
+        f"The closest FAQ question is: '{faq['question']}'.\n"
+        f"The official answer is: '{faq['answer']}'."
+        for number, (user_q, faq) in enumerate(pairs, 1)
+    )
+    prompt = (
+        f"{items}\n\n"
+        "For each numbered item, write a concise, friendly answer for the user, referencing the official FAQ answer but in your own words. "
+        'Reply with a JSON object of the form {"answers": ["...", "..."]}, one answer per item, in order.'
+    )
+
+    try:
+        response = _OPENAI.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            max_tokens=256 * len(pairs),
+            response_format={"type": "json_object"},
+        )
+        answers = json.loads(response.choices[0].message.content)["answers"]
+        if len(answers) == len(pairs) and all(isinstance(answer, str) for answer in answers):
+            return [answer.strip() for answer in answers]
+        logger.warning(f"Batch reply had {len(answers)} answers for {len(pairs)} questions, answering one by one")
+    except Exception as exc:
+        logger.error(f"Batch generation failed, answering one by one: {exc}")
+    return [generate_answer(user_q, faq) for user_q, faq in pairs]
+
+def main(questions_file: str | None = None):
     logger.info("Starting FAQ semantic bot demo.")
-    tracemalloc.start()
+    # Allocation tracing slows every allocation, so it is opt-in
+    if os.getenv("TRACEMALLOC"):
+        tracemalloc.start()
     try:
-        client = connect()
-        setup_collection(client)
-        ingest_faqs(client)
+        # A handful of FAQs is searched faster in memory than through Weaviate
+        local_index = build_local_index(_OPENAI) if len(FAQ_DATA) < LOCAL_SEARCH_MAX_ROWS else None
+        if local_index is None:
+            client = connect()
+            setup_collection(client)
+            ingest_faqs(client)
+        if questions_file:
+            # Offline run: search every question, then answer them all in one LLM call
+            with open(questions_file, encoding="utf-8") as fh:
+                questions = [line.strip() for line in fh if line.strip()]
+            vectors = embed_texts(_OPENAI, questions) if local_index is not None else None
+            pairs = []
+            for i, user_q in enumerate(questions):
+                faq = local_search(local_index, vectors[i]) if vectors else semantic_search(client, user_q)
+                if faq:
+                    pairs.append((user_q, faq))
+                else:
+                    print(f"\nYou: {user_q}\nSorry, I couldn't find a relevant FAQ.")
+            for (user_q, faq), gen in zip(pairs, generate_answers_batch(pairs)):
+                print(f"\nYou: {user_q}\nClosest FAQ: {faq['question']}\nOfficial Answer: {faq['answer']}")
+                print(f"\nBot: {gen or '(Could not generate a custom answer.)'}\n")
+            return
+        # Near-duplicate questions reuse the earlier search result and answer
+        cache = SemanticCache(COLLECTION, _OPENAI)
         logger.info("Ready! Ask a question (or type 'exit'):")
         while True:
             user_q = input("You: ").strip()
             if user_q.lower() in {"exit", "quit"}:
                 break
-            faq = semantic_search(client, user_q)
+            # Check the cache before searching: a cache hit must not pay for a generated answer
+            vector = cache.embed(user_q)
+            if (cached := cache.lookup(vector)) is not None:
+                faq, gen = cached["faq"], cached["answer"]
+                print(f"\nClosest FAQ: {faq['question']}\nOfficial Answer: {faq['answer']}")
+                print(f"\nBot: {gen}\n")
+                continue
+            if local_index is not None:
+                faq, gen = local_search(local_index, vector), None
+            else:
+                # Retrieval and generation in a single round-trip to Weaviate
+                faq, gen = search_and_generate(client, user_q)
             if not faq:
                 print("Sorry, I couldn't find a relevant FAQ.")
                 continue
             print(f"\nClosest FAQ: {faq['question']}\nOfficial Answer: {faq['answer']}")
-            gen = generate_answer(user_q, faq)
             if gen:
                 print(f"\nBot: {gen}\n")
             else:
-                print("\nBot: (Could not generate a custom answer.)\n")
+                # Stream the answer so the first words show up as soon as they are generated
+                print("\nBot: ", end="", flush=True)
+                gen = generate_answer(user_q, faq, stream=True)
+                print("\n" if gen else "(Could not generate a custom answer.)\n")
+            if gen:
+                cache.add(user_q, vector, {"faq": faq, "answer": gen})
     except Exception as exc:
         logger.error(f"Error: {exc}")
     finally:
-        pass
-    logger.info("Session ended.")
+        logger.info("Session ended.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="FAQ semantic bot")
+    parser.add_argument("--questions", help="File with one question per line to answer in a batch")
+    main(parser.parse_args().questions)
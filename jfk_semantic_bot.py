@@ -10,68 +10,97 @@ from __future__ import annotations
 
 import os
 import sys
-import time
+import mmap
 import uuid
 import logging
 import tracemalloc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple
 from tqdm import tqdm
 
-from dotenv import load_dotenv
+import httpx
+import openai
+from config import settings
+from semantic_cache import SemanticCache, local_embedder
+from weaviate_client import batch_import, get_client, near_search
 
-# Load env vars from project root .env
-load_dotenv()
+try:
+    import h2
+except ImportError:  # h2 is optional; without it httpx speaks HTTP/1.1
+    h2 = None
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to character-count chunks
+    tiktoken = None
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load env vars from project root .env (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not all([weaviate_url, weaviate_api_key, openai_api_key]):
     logger.error("Missing required environment variables.")
     sys.exit(1)
 
+# One OpenAI client for the whole session; its keep-alive pool lets
+# successive calls skip the TLS handshake, and with HTTP/2 concurrent
+# requests share a connection instead of opening one each
+_OPENAI = openai.OpenAI(
+    api_key=openai_api_key,
+    max_retries=3,
+    timeout=30.0,
+    http_client=httpx.Client(
+        http2=h2 is not None,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16)
+    ),
+)
+
 COLLECTION = "JFKDocs"
+# Weaviate reads {name} in a generative prompt as a property placeholder
+_NO_BRACES = str.maketrans("{}", "()")
+HNSW_CONFIG = {"ef": 32, "efConstruction": 64, "maxConnections": 16, "distance": "cosine", "skip": False}
 TXT_FILE = Path(__file__).with_name("JFK-Files-Part-2.txt")
-CHARS_PER_CHUNK = 4000  # ~ 1024 tokens (approx)
+CHARS_PER_CHUNK = 4000  # ~ 1024 tokens (approx), used when tiktoken is missing
+EMBEDDING_MODEL = "text-embedding-3-small"
+TOKENS_PER_CHUNK = 1024
+CHUNK_OVERLAP_TOKENS = 128
+# Chunks per parallel batcher process when ingesting a large file
+CHUNKS_PER_SHARD = 200
 
 
 def connect():
-    import weaviate
-    from weaviate.auth import AuthApiKey
-
-    url = weaviate_url if weaviate_url.startswith("https://") else f"https://{weaviate_url}"
-
-    client = weaviate.Client(
-        url=url,
-        auth_client_secret=AuthApiKey(api_key=weaviate_api_key),
-        additional_headers={"X-OpenAI-Api-Key": openai_api_key},
-    )
-    logger.info("Weaviate client base_url: %s", url)
-    if not client.is_ready():
-        logger.error("Weaviate client is not ready.")
+    # The shared v4 client sends queries over gRPC
+    try:
+        client = get_client()
+    except Exception as exc:
+        logger.error("Weaviate client is not ready: %s", exc)
         sys.exit(1)
+    logger.info("Weaviate client cluster_url: %s", weaviate_url)
     return client
 
 
 def setup_collection(client):
-    # delete existing
+    # delete existing (a no-op when there is none, so no exists() round trip)
     try:
-        schema = client.schema.get()
-        if any(cls["class"] == COLLECTION for cls in schema.get("classes", [])):
-            client.schema.delete_class(COLLECTION)
-            time.sleep(1)
+        client.collections.delete(COLLECTION)
     except Exception as exc:
         logger.warning("Could not reset collection: %s", exc)
 
     class_obj: Dict[str, Any] = {
         "class": COLLECTION,
         "description": "Chunks of JFK declassified files",
-        "vectorizer": "text2vec-openai",
+        # Chunks and queries are embedded in-process when sentence-transformers is installed
+        "vectorizer": "none" if local_embedder() is not None else "text2vec-openai",
+        # Searches only ask for the top hit, so a small ef keeps full recall with less graph traversal
+        "vectorIndexType": "hnsw",
+        "vectorIndexConfig": HNSW_CONFIG,
         "moduleConfig": {
             "text2vec-openai": {"model": "text-embedding-3-small", "type": "text"},
             "generative-openai": {"model": "gpt-4o"},
@@ -81,75 +110,171 @@ def setup_collection(client):
             {"name": "chunk_id", "dataType": ["text"], "description": "Chunk identifier"},
         ],
     }
-    client.schema.create_class(class_obj)
+    client.collections.create_from_dict(class_obj)
     logger.info("Collection created.")
 
 
+def _token_chunks(text: str) -> List[str]:
+    """Split text into TOKENS_PER_CHUNK-token chunks overlapping by CHUNK_OVERLAP_TOKENS."""
+    enc = tiktoken.encoding_for_model(EMBEDDING_MODEL)
+    ids = enc.encode_ordinary(text)
+    step = TOKENS_PER_CHUNK - CHUNK_OVERLAP_TOKENS
+    chunks = (enc.decode(ids[i : i + TOKENS_PER_CHUNK]).strip() for i in range(0, len(ids), step))
+    return [chunk for chunk in chunks if chunk]
+
+
+def _char_chunks(data: bytes) -> List[str]:
+    """Pack the paragraphs of data into chunks of about CHARS_PER_CHUNK characters."""
+    # Split in C at paragraph breaks; only paragraphs too long for one chunk fall back to lines
+    pieces: List[bytes] = []
+    for paragraph in data.split(b"\n\n"):
+        if len(paragraph) > CHARS_PER_CHUNK:
+            pieces.extend(paragraph.splitlines(keepends=True))
+        elif paragraph.strip():
+            pieces.append(paragraph + b"\n\n")
+
+    chunks: List[str] = []
+    curr: List[bytes] = []
+    curr_len = 0
+    for piece in pieces:
+        if curr and curr_len + len(piece) > CHARS_PER_CHUNK:
+            chunks.append(b"".join(curr).decode("utf-8", errors="ignore").strip())
+            curr = []
+            curr_len = 0
+        curr.append(piece)
+        curr_len += len(piece)
+    if curr:
+        chunks.append(b"".join(curr).decode("utf-8", errors="ignore").strip())
+    return [chunk for chunk in chunks if chunk]
+
+
 def _read_chunks() -> List[str]:
     if not TXT_FILE.exists():
         logger.error("Text file not found: %s", TXT_FILE)
         sys.exit(1)
 
-    chunks: List[str] = []
-    curr: List[str] = []
-    curr_len = 0
-    with TXT_FILE.open("r", encoding="utf-8", errors="ignore") as fh:
-        for line in fh:
-            if line.strip() == "":
-                # treat paragraph break
-                line = "\n"
-            if curr_len + len(line) > CHARS_PER_CHUNK:
-                chunks.append("".join(curr).strip())
-                curr = [line]
-                curr_len = len(line)
-            else:
-                curr.append(line)
-                curr_len += len(line)
-        if curr:
-            chunks.append("".join(curr).strip())
+    with TXT_FILE.open("rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            data = b""
+        else:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = mm[:]
+
+    # Exact token counts when tiktoken is installed, character counts otherwise
+    if tiktoken is not None:
+        chunks = _token_chunks(data.decode("utf-8", errors="ignore"))
+    else:
+        chunks = _char_chunks(data)
     logger.info("Prepared %d chunks for ingestion.", len(chunks))
     return chunks
 
 
-def _ingest_one(client, idx: int, chunk: str):
-    obj = {"text": chunk, "chunk_id": f"part2_{idx}"}
-    client.data_object.create(obj, COLLECTION, uuid=str(uuid.uuid4()))
+def _log_ingest_error(properties, message):
+    logger.warning("Failed to ingest %s: %s", properties.get("chunk_id"), message)
+
+
+def _ingest_shard(objects) -> int:
+    """Import one shard through this process's own Weaviate client."""
+    batch_import(
+        get_client(),
+        COLLECTION,
+        objects,
+        on_error=_log_ingest_error,
+        batch_size=100,
+        concurrent_requests=2,
+    )
+    return len(objects)
 
 
 def ingest_docs(client):
     chunks = _read_chunks()
-    workers = min(32, os.cpu_count())
-    logger.info("Ingesting %d chunks with %d workers...", len(chunks), workers)
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = {
-            executor.submit(_ingest_one, client, idx, chunk): idx for idx, chunk in enumerate(chunks)
-        }
-        for _ in tqdm(as_completed(futures), total=len(futures), desc="Ingesting"):
-            pass
+    model = local_embedder()
+    if model is not None:
+        logger.info("Embedding %d chunks locally...", len(chunks))
+        vectors = model.encode(chunks, batch_size=64, normalize_embeddings=True).tolist()
+    else:
+        vectors = [None] * len(chunks)
+    objects = [
+        ({"text": chunk, "chunk_id": f"part2_{idx}"}, uuid.uuid4(), vector)
+        for idx, (chunk, vector) in enumerate(zip(chunks, vectors))
+    ]
+
+    shards = min(os.cpu_count(), max(1, len(objects) // CHUNKS_PER_SHARD))
+    if shards > 1:
+        # One batcher process per shard keeps every core serialising and sending.
+        # Each opens its own client; spawn, not fork, so no gRPC channel is inherited
+        logger.info("Ingesting %d chunks in %d parallel shards...", len(objects), shards)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=shards, mp_context=context) as executor, \
+                tqdm(total=len(objects), desc="Ingesting") as progress:
+            futures = [executor.submit(_ingest_shard, objects[i::shards]) for i in range(shards)]
+            for future in as_completed(futures):
+                progress.update(future.result())
+        logger.info("All chunks ingested.")
+        return
+
+    workers = min(8, os.cpu_count())
+    logger.info("Ingesting %d chunks with %d workers...", len(objects), workers)
+    # The batcher sends many objects per request, so text2vec-openai embeds them together;
+    # on rate limits it backs off, sends fewer requests at once and retries the rejected chunks
+    batch_import(
+        client,
+        COLLECTION,
+        tqdm(objects, desc="Ingesting"),
+        on_error=_log_ingest_error,
+        batch_size=100,
+        concurrent_requests=workers,
+    )
     logger.info("All chunks ingested.")
-    time.sleep(3)
 
 
 def semantic_search(client, query: str) -> Dict[str, Any] | None:
     try:
-        res = (
-            client.query.get(COLLECTION, ["text", "chunk_id"])
-            .with_near_text({"concepts": [query]})
-            .with_limit(1)
-            .do()
+        # nearText (or nearVector with a local embedding) over gRPC
+        res = near_search(
+            client.collections.get(COLLECTION).query,
+            query,
+            limit=1,
+            return_properties=["text", "chunk_id"],
         )
-        docs = res.get("data", {}).get("Get", {}).get(COLLECTION, [])
-        if docs:
-            return docs[0]
+        if res.objects:
+            return res.objects[0].properties
     except Exception as exc:
         logger.error("Search failed: %s", exc)
     return None
 
 
-def generate_answer(user_q: str, doc: Dict[str, Any]) -> str | None:
-    import openai
+def search_and_generate(client, user_q: str) -> Tuple[Dict[str, Any] | None, str | None]:
+    """Find the closest passage and answer from it in one Weaviate request.
+
+    generative-openai fills {text} with the retrieved passage server-side,
+    so there is no separate OpenAI round-trip from here.
+    """
+    prompt = (
+        f"A user asked: '{user_q.translate(_NO_BRACES)}'.\n"
+        "Here is a passage from declassified JFK documents that might be relevant:\n"
+        "---\n{text}\n---\n"
+        "Based only on the information provided in the passage, answer the user's question in a concise, factual way."
+    )
+    try:
+        res = near_search(
+            client.collections.get(COLLECTION).generate,
+            user_q,
+            limit=1,
+            single_prompt=prompt,
+            return_properties=["text", "chunk_id"],
+        )
+    except Exception as exc:
+        logger.warning("Generative search failed, searching without it: %s", exc)
+        return semantic_search(client, user_q), None
+    if not res.objects:
+        return None, None
+    obj = res.objects[0]
+    return obj.properties, (obj.generated or "").strip() or None
+
 
-    openai_client = openai.OpenAI()
+def generate_answer(user_q: str, doc: Dict[str, Any], stream: bool = False) -> str | None:
+    """Answer user_q from doc; with stream=True, print tokens as they arrive."""
     prompt = (
         f"A user asked: '{user_q}'.\n"
         "Here is a passage from declassified JFK documents that might be relevant:\n"\
@@ -158,13 +283,21 @@ def generate_answer(user_q: str, doc: Dict[str, Any]) -> str | None:
     )
 
     try:
-        response = openai_client.chat.completions.create(
+        response = _OPENAI.chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3,
             max_tokens=512,
+            stream=stream,
         )
-        return response.choices[0].message.content.strip()
+        if not stream:
+            return response.choices[0].message.content.strip()
+        parts = []
+        for chunk in response:
+            if chunk.choices and (text := chunk.choices[0].delta.content):
+                print(text, end="", flush=True)
+                parts.append(text)
+        return "".join(parts).strip() or None
     except Exception as exc:
         logger.error("OpenAI generation failed: %s", exc)
         return None
@@ -172,11 +305,16 @@ def generate_answer(user_q: str, doc: Dict[str, Any]) -> str | None:
 
 def main():
     logger.info("Starting JFK semantic bot demo.")
-    tracemalloc.start()
+    # Allocation tracing slows every allocation, so it is opt-in
+    if os.getenv("TRACEMALLOC"):
+        tracemalloc.start()
     client = connect()
     setup_collection(client)
     ingest_docs(client)
 
+    # Near-duplicate questions reuse the earlier passage and answer
+    cache = SemanticCache(COLLECTION, _OPENAI)
+
     logger.info("Ready! Ask a question (or type 'exit'):")
     while True:
         try:
@@ -185,16 +323,27 @@ def main():
             break
         if user_q.lower() in {"exit", "quit"}:
             break
-        doc = semantic_search(client, user_q)
+        # Check the cache before searching: a cache hit must not pay for a generated answer
+        vector = cache.embed(user_q)
+        if (cached := cache.lookup(vector)) is not None:
+            doc, answer = cached["doc"], cached["answer"]
+            print(f"\nClosest passage (chunk {doc['chunk_id']}):\n{doc['text'][:300]}...\n")
+            print(f"\nBot: {answer}\n")
+            continue
+        doc, answer = search_and_generate(client, user_q)
         if not doc:
             print("Sorry, I couldn't find relevant info.")
             continue
         print(f"\nClosest passage (chunk {doc['chunk_id']}):\n{doc['text'][:300]}...\n")
-        answer = generate_answer(user_q, doc)
         if answer:
             print(f"\nBot: {answer}\n")
         else:
-            print("\nBot: (Could not generate an answer.)\n")
+            # Server-side generation failed; stream an answer from the passage instead
+            print("\nBot: ", end="", flush=True)
+            answer = generate_answer(user_q, doc, stream=True)
+            print("\n" if answer else "(Could not generate an answer.)\n")
+        if answer:
+            cache.add(user_q, vector, {"doc": doc, "answer": answer})
 
     logger.info("Session ended.")
 
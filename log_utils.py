@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+# Banner lines go through their own logger with a message-only format, so
+# they are emitted as one atomic record without a timestamp prefix.
+_section_logger = logging.getLogger("section")
+_section_handler = logging.StreamHandler()
+_section_handler.setFormatter(logging.Formatter("%(message)s"))
+_section_logger.addHandler(_section_handler)
+_section_logger.setLevel(logging.INFO)
+_section_logger.propagate = False
+
+
+def queued_handler(*handlers: logging.Handler) -> logging.Handler:
+    """Return a handler that hands records to handlers on a background thread.
+
+    Logging calls only enqueue the record; file and stream writes happen on the
+    listener thread, which is flushed and stopped at interpreter exit.
+    """
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return logging.handlers.QueueHandler(log_queue)
+
+
+def section(title: str) -> None:
+    """Log a section banner."""
+    _section_logger.info("─── %s ───", title)
+
+
+def pretty_json(obj, limit: Optional[int] = None) -> str:
+    """Serialize obj as indented JSON, using orjson when it is installed.
+
+    With limit set, output is cut to limit characters followed by "...".
+    Without orjson, encoding stops as soon as enough text has been produced.
+    """
+    if orjson is not None:
+        try:
+            text = orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+        except TypeError:
+            # orjson rejects some inputs (e.g. non-str keys) that json accepts
+            pass
+        else:
+            if limit is not None and len(text) > limit:
+                return text[:limit] + "..."
+            return text
+
+    if limit is not None:
+        # The indenting stdlib encoder is pure Python, so stop it early
+        parts, size = [], 0
+        for chunk in json.JSONEncoder(indent=2).iterencode(obj):
+            parts.append(chunk)
+            size += len(chunk)
+            if size > limit:
+                return "".join(parts)[:limit] + "..."
+        return "".join(parts)
+
+    return json.dumps(obj, indent=2)
+
+
+class LazyJson:
+    """Defer JSON serialization until a log record using it is actually emitted."""
+    __slots__ = ('obj', 'limit')
+
+    def __init__(self, obj, limit: Optional[int] = None):
+        self.obj = obj
+        self.limit = limit
+
+    def __str__(self):
+        return pretty_json(self.obj, self.limit)
@@ -3,10 +3,12 @@
 import os
 import sys
 import logging
-import json
-from dotenv import load_dotenv
+from collections import defaultdict
+from config import settings
 import weaviate
 from weaviate.auth import AuthApiKey
+from log_utils import LazyJson
+from weaviate_client import cached_get_meta
 
 # Set up logging
 logging.basicConfig(
@@ -22,11 +24,11 @@ logger = logging.getLogger("WeaviateModules")
 ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-# Load environment variables
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL or WEAVIATE_API_KEY")
@@ -57,7 +59,7 @@ def main():
         
         # Get meta information
         logger.info("Retrieving meta information")
-        meta = client.get_meta()
+        meta = cached_get_meta(client)
         
         # Print Weaviate version
         if 'version' in meta:
@@ -68,19 +70,17 @@ def main():
             modules = meta['modules']
             logger.info(f"Found {len(modules)} modules:")
             
-            # Group modules by type
-            module_groups = {}
+            # Group modules by type; sorting once up front leaves every group sorted
+            module_groups = defaultdict(list)
             
-            for module_name in modules:
-                prefix = module_name.split('-')[0] if '-' in module_name else "other"
-                if prefix not in module_groups:
-                    module_groups[prefix] = []
-                module_groups[prefix].append(module_name)
+            for module_name in sorted(modules):
+                prefix, sep, _ = module_name.partition('-')
+                module_groups[prefix if sep else "other"].append(module_name)
             
             # Print modules by group
             for group, group_modules in module_groups.items():
                 logger.info(f"  {group.upper()} MODULES:")
-                for module in sorted(group_modules):
+                for module in group_modules:
                     logger.info(f"    - {module}")
         else:
             logger.warning("No modules found in Weaviate meta information")
@@ -107,7 +107,7 @@ def main():
                         if 'moduleConfig' in cls:
                             logger.info(f"    Module configurations:")
                             for module, config in cls['moduleConfig'].items():
-                                logger.info(f"      {module}: {json.dumps(config, indent=2)}")
+                                logger.info("      %s: %s", module, LazyJson(config))
                 else:
                     logger.info("No classes found in schema")
             else:
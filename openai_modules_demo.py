@@ -2,22 +2,26 @@
 
 import os
 import sys
-import time
 import uuid
 import logging
-import json
-from typing import Dict, List, Any, Optional
-from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+from config import settings
+from log_utils import queued_handler
+
+# The Weaviate and OpenAI SDKs are imported where they are first used, so
+# importing this module stays cheap until a demo actually runs
 
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler("openai_modules_demo.log"),
-        logging.StreamHandler()
+        # File and console writes happen off the calling thread
+        queued_handler(
+            logging.FileHandler("openai_modules_demo.log"),
+            logging.StreamHandler()
+        )
     ]
 )
 logger = logging.getLogger("OpenAIModulesDemo")
@@ -26,15 +30,50 @@ logger = logging.getLogger("OpenAIModulesDemo")
 ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-# Load environment variables
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Define the collection name for our demo
+COLLECTION_NAME = "AIArticles"
+
+# Sample articles, built once at import. Plain dicts in a tuple: the client
+# validates insert properties as dicts, so MappingProxyType views won't do
+SAMPLE_ARTICLES = (
+    {
+        "title": "Understanding Large Language Models",
+        "content": "Large Language Models (LLMs) are deep learning algorithms that can recognize, summarize, translate, predict, and generate text and other content based on knowledge gained from massive datasets. They use transformer architectures to handle sequential data and attention mechanisms to focus on relevant parts of the input. Popular examples include GPT-4, Claude, and Gemini.",
+        "category": "AI Technology",
+        "url": "https://example.com/llm-overview"
+    },
+    {
+        "title": "Vector Databases for AI Applications",
+        "content": "Vector databases are specialized database systems designed to store and query high-dimensional vectors efficiently. They are crucial for AI applications that rely on embeddings, such as semantic search, recommendation systems, and similarity matching. Unlike traditional databases, vector databases use approximate nearest neighbor (ANN) algorithms to find similar vectors quickly.",
+        "category": "AI Infrastructure",
+        "url": "https://example.com/vector-databases"
+    },
+    {
+        "title": "The Ethics of Artificial Intelligence",
+        "content": "AI ethics involves designing and using AI systems responsibly and ethically. Key concerns include bias and fairness, privacy, transparency, accountability, and the long-term impacts on society and employment. As AI becomes more powerful and widespread, ensuring these systems align with human values and benefit humanity becomes increasingly important.",
+        "category": "AI Ethics",
+        "url": "https://example.com/ai-ethics"
+    },
+    {
+        "title": "Prompt Engineering Techniques",
+        "content": "Prompt engineering is the practice of designing effective prompts to get the best results from language models. Techniques include using clear instructions, providing examples (few-shot learning), breaking complex tasks into steps, and using specific formatting. Good prompt engineering can significantly improve the quality, relevance, and accuracy of AI-generated outputs.",
+        "category": "AI Usage",
+        "url": "https://example.com/prompt-engineering"
+    },
+    {
+        "title": "Multimodal AI Systems",
+        "content": "Multimodal AI systems can process and generate content across multiple types of data, such as text, images, audio, and video. These systems combine different neural network architectures to understand relationships between different modalities. Examples include GPT-4V, Gemini, and Claude Opus, which can analyze images and respond with text.",
+        "category": "AI Technology",
+        "url": "https://example.com/multimodal-ai"
+    }
+)
+
+# Queries for the two search demos
+VECTOR_SEARCH_QUERY = "What are the ethical considerations in AI?"
+GENERATIVE_SEARCH_QUERY = "What are vector databases?"
 
-if not weaviate_url or not weaviate_api_key or not openai_api_key:
-    logger.error("Missing required environment variables: WEAVIATE_URL, WEAVIATE_API_KEY, or OPENAI_API_KEY")
-    sys.exit(1)
+# Prompt for the generative search; Weaviate fills {content} from the matched article
+SIMPLIFY_PROMPT = "Explain this in simpler terms: {content}"
 
 
 class OpenAIModulesDemo:
@@ -42,41 +81,44 @@ class OpenAIModulesDemo:
     
     def __init__(self):
         """Initialize the demo."""
+        import openai
+        
+        # Load environment variables (parsed once and shared across scripts)
+        self.cfg = settings()
+        if not self.cfg.weaviate_url or not self.cfg.weaviate_api_key or not self.cfg.openai_api_key:
+            logger.error("Missing required environment variables: WEAVIATE_URL, WEAVIATE_API_KEY, or OPENAI_API_KEY")
+            sys.exit(1)
+        
         self.client = None
-        self.class_name = "AIArticles"
+        self.class_name = COLLECTION_NAME
+        # Queries are embedded here (and cached) rather than by Weaviate on every search
+        self.openai_client = openai.OpenAI(api_key=self.cfg.openai_api_key)
         self.connect_to_weaviate()
     
     def connect_to_weaviate(self) -> None:
-        """Connect to Weaviate Cloud."""
+        """Connect to Weaviate Cloud.
+
+        The client is shared by every demo in the process, so only the first
+        construction pays for the connection and readiness check.
+        """
+        from weaviate_client import get_client
+        
         try:
-            logger.info(f"Connecting to Weaviate at {weaviate_url}")
-            
-            # Connect to Weaviate using the client API
-            self.client = weaviate.connect_to_weaviate_cloud(
-                cluster_url=weaviate_url,
-                auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-                headers={
-                    "X-OpenAI-Api-Key": openai_api_key  # For OpenAI modules
-                }
-            )
-            
-            # Check if client is ready
-            is_ready = self.client.is_ready()
-            logger.info(f"Connection status: {is_ready}")
-            
-            if not is_ready:
-                logger.error("Weaviate client is not ready")
-                sys.exit(1)
-                
+            logger.info(f"Connecting to Weaviate at {self.cfg.weaviate_url}")
+            self.client = get_client()
         except Exception as e:
             logger.error(f"Error connecting to Weaviate: {e}")
             sys.exit(1)
     
     def close_connection(self) -> None:
-        """Close the Weaviate client connection."""
+        """Release this demo's handle on the shared Weaviate client.
+
+        The client itself stays open for later demos and is closed at
+        interpreter exit.
+        """
         if self.client:
-            logger.info("Closing Weaviate connection")
-            self.client.close()
+            logger.info("Releasing Weaviate connection")
+            self.client = None
     
     def setup_schema(self) -> None:
         """Set up the schema for the demo."""
@@ -84,33 +126,19 @@ class OpenAIModulesDemo:
             # Use collections API to create and manage schema
             logger.info(f"Creating schema with text2vec-openai vectorizer")
             
-            # First, check if the collection exists and delete it if it does
-            try:
-                # Try to get the collection to see if it exists
-                response = self.client._connection.get(f"collections/{self.class_name}")
-                
-                if response.status_code == 200:
-                    # Collection exists, delete it
-                    logger.info(f"Deleting existing collection: {self.class_name}")
-                    delete_response = self.client._connection.delete(f"collections/{self.class_name}")
-                    
-                    if delete_response.status_code != 200:
-                        logger.warning(f"Failed to delete collection: {delete_response.status_code} - {delete_response.text}")
-                        time.sleep(1)  # Wait a bit before trying to create
-            except Exception as e:
-                # Collection might not exist, which is fine
-                logger.info(f"Collection check failed, assuming it doesn't exist: {e}")
+            # Drop any previous copy; deleting a missing collection is a no-op
+            self.client.collections.delete(self.class_name)
             
             # Create collection with text2vec-openai vectorizer
             collection_obj = {
-                "name": self.class_name,
+                "class": self.class_name,
                 "description": "AI-related articles for demonstration",
                 "vectorizer": "text2vec-openai",
-                "vectorizerConfig": {
-                    "model": "text-embedding-3-small",
-                    "type": "text"
-                },
                 "moduleConfig": {
+                    "text2vec-openai": {
+                        "model": "text-embedding-3-small",
+                        "type": "text"
+                    },
                     "generative-openai": {
                         "model": "gpt-3.5-turbo"
                     }
@@ -161,14 +189,8 @@ class OpenAIModulesDemo:
                 ]
             }
             
-            # Create the collection using direct REST API
-            response = self.client._connection.post("collections", collection_obj)
-            
-            if response.status_code == 200:
-                logger.info(f"Schema created successfully: {self.class_name}")
-            else:
-                logger.error(f"Failed to create schema: {response.status_code} - {response.text}")
-                sys.exit(1)
+            self.client.collections.create_from_dict(collection_obj)
+            logger.info(f"Schema created successfully: {self.class_name}")
             
         except Exception as e:
             logger.error(f"Error setting up schema: {e}")
@@ -176,188 +198,121 @@ class OpenAIModulesDemo:
     
     def add_sample_data(self) -> None:
         """Add sample data to the collection."""
+        from weaviate.classes.data import DataObject
+        from weaviate_client import wait_for_object_count
+        
         try:
-            sample_data = [
-                {
-                    "title": "Understanding Large Language Models",
-                    "content": "Large Language Models (LLMs) are deep learning algorithms that can recognize, summarize, translate, predict, and generate text and other content based on knowledge gained from massive datasets. They use transformer architectures to handle sequential data and attention mechanisms to focus on relevant parts of the input. Popular examples include GPT-4, Claude, and Gemini.",
-                    "category": "AI Technology",
-                    "url": "https://example.com/llm-overview"
-                },
-                {
-                    "title": "Vector Databases for AI Applications",
-                    "content": "Vector databases are specialized database systems designed to store and query high-dimensional vectors efficiently. They are crucial for AI applications that rely on embeddings, such as semantic search, recommendation systems, and similarity matching. Unlike traditional databases, vector databases use approximate nearest neighbor (ANN) algorithms to find similar vectors quickly.",
-                    "category": "AI Infrastructure",
-                    "url": "https://example.com/vector-databases"
-                },
-                {
-                    "title": "The Ethics of Artificial Intelligence",
-                    "content": "AI ethics involves designing and using AI systems responsibly and ethically. Key concerns include bias and fairness, privacy, transparency, accountability, and the long-term impacts on society and employment. As AI becomes more powerful and widespread, ensuring these systems align with human values and benefit humanity becomes increasingly important.",
-                    "category": "AI Ethics",
-                    "url": "https://example.com/ai-ethics"
-                },
-                {
-                    "title": "Prompt Engineering Techniques",
-                    "content": "Prompt engineering is the practice of designing effective prompts to get the best results from language models. Techniques include using clear instructions, providing examples (few-shot learning), breaking complex tasks into steps, and using specific formatting. Good prompt engineering can significantly improve the quality, relevance, and accuracy of AI-generated outputs.",
-                    "category": "AI Usage",
-                    "url": "https://example.com/prompt-engineering"
-                },
-                {
-                    "title": "Multimodal AI Systems",
-                    "content": "Multimodal AI systems can process and generate content across multiple types of data, such as text, images, audio, and video. These systems combine different neural network architectures to understand relationships between different modalities. Examples include GPT-4V, Gemini, and Claude Opus, which can analyze images and respond with text.",
-                    "category": "AI Technology",
-                    "url": "https://example.com/multimodal-ai"
-                }
-            ]
+            sample_data = SAMPLE_ARTICLES
             
             logger.info(f"Adding {len(sample_data)} sample articles to {self.class_name}")
             
-            # Add data using batch processing
-            with self.client.batch as batch:
-                batch.batch_size = 10
-                
-                for idx, data in enumerate(sample_data):
-                    logger.info(f"Adding article {idx+1}: {data['title']}")
-                    
-                    # Generate a UUID for the object
-                    object_uuid = str(uuid.uuid4())
-                    
-                    # Add the data object to the batch
-                    batch.add_data_object(
-                        data_object=data,
-                        class_name=self.class_name,
-                        uuid=object_uuid
-                    )
+            # One insert_many request carries every article, so the vectorizer embeds them together.
+            # IDs come from the title, so a rerun overwrites rather than duplicates
+            articles = self.client.collections.get(self.class_name)
+            result = articles.data.insert_many(
+                [DataObject(properties=data, uuid=uuid.uuid5(uuid.NAMESPACE_URL, data["title"])) for data in sample_data]
+            )
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                for data in sample_data:
+                    logger.debug("Added %s", data["title"])
             
-            logger.info("Sample data added successfully")
+            if result.has_errors:
+                first_error = next(iter(result.errors.values()))
+                logger.warning(f"Failed to add {len(result.errors)} of {len(sample_data)} articles: {first_error.message}")
+            logger.info("Inserted %d articles", len(sample_data) - len(result.errors))
             
-            # Wait for indexing to complete
+            # Wait until the inserted articles are visible to queries
             logger.info("Waiting for indexing to complete...")
-            time.sleep(2)
+            wait_for_object_count(self.client, self.class_name, len(sample_data) - len(result.errors))
             
         except Exception as e:
             logger.error(f"Error adding sample data: {e}")
     
-    def demonstrate_vector_search(self) -> None:
-        """Demonstrate vector search using text2vec-openai."""
+    def _vector_search(self, query: str):
+        """Return up to three articles close to query."""
+        from weaviate.classes.query import MetadataQuery
+        from semantic_cache import cached_embedding
+        
+        # nearVector over gRPC with the cached query embedding
+        return self.client.collections.get(self.class_name).query.near_vector(
+            near_vector=cached_embedding(self.openai_client, query),
+            certainty=0.7,
+            limit=3,
+            return_properties=["title", "category"],
+            return_metadata=MetadataQuery(certainty=True)
+        ).objects
+    
+    def _generative_search(self, query: str):
+        """Return the article closest to query with a simplified explanation."""
+        from semantic_cache import cached_embedding
+        
+        # Search and generation in one gRPC request
+        return self.client.collections.get(self.class_name).generate.near_vector(
+            near_vector=cached_embedding(self.openai_client, query),
+            limit=1,
+            single_prompt=SIMPLIFY_PROMPT,
+            return_properties=["title", "content"]
+        ).objects
+    
+    def demonstrate_vector_search(self, articles_future: Optional[Future] = None) -> None:
+        """Demonstrate vector search using text2vec-openai.
+        
+        articles_future, if given, holds a _vector_search already in flight.
+        """
         try:
             logger.info("\n=== DEMONSTRATING VECTOR SEARCH WITH TEXT2VEC-OPENAI ===\n")
             
             # Perform a semantic search
-            query = "What are the ethical considerations in AI?"
+            query = VECTOR_SEARCH_QUERY
             logger.info(f"Performing semantic search with query: '{query}'")
             
-            # Use the query API to perform a nearText search
-            result = self.client._connection.post(
-                "graphql",
-                {
-                    "query": f"""
-                    {{
-                      Get {{
-                        {self.class_name}(
-                          nearText: {{
-                            concepts: ["{query}"]
-                            certainty: 0.7
-                          }}
-                          limit: 3
-                        ) {{
-                          title
-                          category
-                          _additional {{
-                            certainty
-                          }}
-                        }}
-                      }}
-                    }}
-                    """
-                }
-            )
+            if articles_future is not None:
+                articles = articles_future.result()
+            else:
+                articles = self._vector_search(query)
             
-            if result.status_code == 200:
-                data = result.json()
+            if articles:
+                logger.info(f"Found {len(articles)} relevant articles:")
                 
-                if "data" in data and "Get" in data["data"] and self.class_name in data["data"]["Get"]:
-                    articles = data["data"]["Get"][self.class_name]
-                    logger.info(f"Found {len(articles)} relevant articles:")
-                    
-                    for idx, article in enumerate(articles):
-                        certainty = article["_additional"]["certainty"] if "_additional" in article and "certainty" in article["_additional"] else "N/A"
-                        logger.info(f"  {idx+1}. {article['title']} (Category: {article['category']}, Relevance: {certainty:.2f})")
-                else:
-                    logger.warning("No results found or unexpected response structure")
+                for idx, article in enumerate(articles):
+                    logger.info(f"  {idx+1}. {article.properties['title']} (Category: {article.properties['category']}, Relevance: {article.metadata.certainty:.2f})")
             else:
-                logger.error(f"Search failed: {result.status_code} - {result.text}")
+                logger.warning("No results found")
             
         except Exception as e:
             logger.error(f"Error demonstrating vector search: {e}")
     
-    def demonstrate_generative_ai(self) -> None:
-        """Demonstrate generative AI using generative-openai."""
+    def demonstrate_generative_ai(self, articles_future: Optional[Future] = None) -> None:
+        """Demonstrate generative AI using generative-openai.
+        
+        articles_future, if given, holds a _generative_search already in flight.
+        """
+        from weaviate_client import response_json
+        
         try:
             logger.info("\n=== DEMONSTRATING GENERATIVE AI WITH GENERATIVE-OPENAI ===\n")
             
             # Perform a generative query
-            query = "What are vector databases?"
+            query = GENERATIVE_SEARCH_QUERY
             logger.info(f"Performing generative search with query: '{query}'")
             
-            # Use the query API to perform a search with generate
-            result = self.client._connection.post(
-                "graphql",
-                {
-                    "query": f"""
-                    {{
-                      Get {{
-                        {self.class_name}(
-                          nearText: {{
-                            concepts: ["{query}"]
-                          }}
-                          limit: 1
-                        ) {{
-                          title
-                          content
-                          _additional {{
-                            generate(
-                              singleResult: {{
-                                prompt: "Explain this in simpler terms:"
-                              }}
-                            ) {{
-                              singleResult
-                              error
-                            }}
-                          }}
-                        }}
-                      }}
-                    }}
-                    """
-                }
-            )
+            if articles_future is not None:
+                articles = articles_future.result()
+            else:
+                articles = self._generative_search(query)
             
-            if result.status_code == 200:
-                data = result.json()
+            if articles:
+                article = articles[0]
+                logger.info(f"Article: {article.properties['title']}")
+                logger.info(f"Original content: {article.properties['content']}")
                 
-                if "data" in data and "Get" in data["data"] and self.class_name in data["data"]["Get"]:
-                    articles = data["data"]["Get"][self.class_name]
-                    
-                    if articles:
-                        article = articles[0]
-                        logger.info(f"Article: {article['title']}")
-                        logger.info(f"Original content: {article['content']}")
-                        
-                        if "_additional" in article and "generate" in article["_additional"]:
-                            generated = article["_additional"]["generate"]
-                            
-                            if "singleResult" in generated:
-                                logger.info(f"\nSimplified explanation: {generated['singleResult']}")
-                            elif "error" in generated:
-                                logger.error(f"Generation error: {generated['error']}")
-                        else:
-                            logger.warning("No generated content found")
-                    else:
-                        logger.warning("No articles found")
+                if article.generated:
+                    logger.info(f"\nSimplified explanation: {article.generated}")
                 else:
-                    logger.warning("No results found or unexpected response structure")
+                    logger.warning("No generated content found")
             else:
-                logger.error(f"Generative query failed: {result.status_code} - {result.text}")
+                logger.warning("No articles found")
             
             # Demonstrate a standalone generative query (not tied to specific objects)
             logger.info("\n=== DEMONSTRATING STANDALONE GENERATIVE QUERY ===\n")
@@ -374,7 +329,7 @@ class OpenAIModulesDemo:
             )
             
             if result.status_code == 200:
-                data = result.json()
+                data = response_json(result)
                 if "text" in data:
                     logger.info(f"Generated response:\n{data['text']}")
                 else:
@@ -394,11 +349,17 @@ class OpenAIModulesDemo:
             # Add sample data
             self.add_sample_data()
             
-            # Demonstrate vector search
-            self.demonstrate_vector_search()
-            
-            # Demonstrate generative AI
-            self.demonstrate_generative_ai()
+            # The two searches are independent, so send both at once and
+            # report them in order as they come back
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                vector_future = executor.submit(self._vector_search, VECTOR_SEARCH_QUERY)
+                generative_future = executor.submit(self._generative_search, GENERATIVE_SEARCH_QUERY)
+                
+                # Demonstrate vector search
+                self.demonstrate_vector_search(vector_future)
+                
+                # Demonstrate generative AI
+                self.demonstrate_generative_ai(generative_future)
             
         except Exception as e:
             logger.error(f"Error running demo: {e}")
@@ -2,13 +2,16 @@
 
 import os
 import sys
-import time
 import uuid
 import logging
 import json
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
 import weaviate
 from weaviate.auth import AuthApiKey
+from weaviate.classes.query import MetadataQuery
+from weaviate.exceptions import UnexpectedStatusCodeError
+from weaviate_client import CONN_CONFIG, CONN_HEADERS, batch_import, cached_get_meta, response_json, wait_for_object_count
 
 # Set up logging
 logging.basicConfig(
@@ -24,11 +27,11 @@ logger = logging.getLogger("OpenAIModulesDemo")
 ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-# Load environment variables from .env file
-load_dotenv(os.path.join(ROOT, '.env'))
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key or not openai_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL, WEAVIATE_API_KEY, or OPENAI_API_KEY")
@@ -37,6 +40,22 @@ if not weaviate_url or not weaviate_api_key or not openai_api_key:
 # Define the collection name for our demo
 COLLECTION_NAME = "AIArticles"
 
+# Queries and prompts for the three demos
+VECTOR_SEARCH_QUERY = "What are the ethical considerations in AI?"
+GENERATIVE_SEARCH_QUERY = "What are vector databases?"
+STANDALONE_PROMPT = "Explain the concept of vector embeddings in AI in 3 sentences."
+
+# Prompt for the generative search; Weaviate fills {content} from the matched article
+SIMPLIFY_PROMPT = "Explain this in simpler terms: {content}"
+
+# Modules the demo cannot run without
+REQUIRED_MODULES = frozenset({"text2vec-openai", "generative-openai"})
+
+# Import tuning: objects per batch request and batch requests in flight at once
+BATCH_SIZE = 64
+CONCURRENT_REQUESTS = 4
+
+
 def connect_to_weaviate():
     """Connect to Weaviate Cloud instance."""
     # Ensure the URL has https:// prefix
@@ -50,9 +69,8 @@ def connect_to_weaviate():
         client = weaviate.connect_to_weaviate_cloud(
             cluster_url=weaviate_url,
             auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-            headers={
-                "X-OpenAI-Api-Key": openai_api_key  # For OpenAI modules
-            }
+            headers=CONN_HEADERS,  # OpenAI key header, omitted when unset
+            additional_config=CONN_CONFIG  # keep-alive pool for the REST calls below
         )
         
         # Check if client is ready
@@ -70,19 +88,19 @@ def connect_to_weaviate():
 
 
 def check_openai_modules(client):
-    """Check if OpenAI modules are available."""
+    """Return the set of OpenAI modules the cluster has enabled."""
     try:
-        meta = client.get_meta()
+        meta = cached_get_meta(client)
         
         # Print Weaviate version
         if 'version' in meta:
             logger.info(f"Weaviate version: {meta['version']}")
         
         # Check for OpenAI modules
-        openai_modules = []
+        openai_modules = set()
         if 'modules' in meta:
             modules = meta['modules']
-            openai_modules = [m for m in modules.keys() if 'openai' in m]
+            openai_modules = {m for m in modules if 'openai' in m}
             
             if openai_modules:
                 logger.info(f"Found {len(openai_modules)} OpenAI modules:")
@@ -94,46 +112,82 @@ def check_openai_modules(client):
         return openai_modules
     except Exception as e:
         logger.error(f"Error checking OpenAI modules: {e}")
-        return []
+        return set()
+
+
+def _existing_config(client):
+    """Return the CollectionConfig of COLLECTION_NAME, or None if it does not exist."""
+    try:
+        return client.collections.get(COLLECTION_NAME).config.get()
+    except UnexpectedStatusCodeError as e:
+        if e.status_code == 404:
+            return None
+        raise
+
+
+def _options_match(existing, wanted):
+    """Return True if every option in wanted is set to the same value in existing."""
+    return all(existing.get(key) == value for key, value in wanted.items())
+
+
+def _property_vectorizer_matches(existing, wanted):
+    """Return True if a property's vectorizer settings (a PropertyVectorizerConfig
+    or None) match the "skip"/"vectorizePropertyName" options set in wanted."""
+    if existing is None:
+        return not wanted
+    return all(
+        getattr(existing, attr) == wanted[key]
+        for key, attr in (("skip", "skip"), ("vectorizePropertyName", "vectorize_property_name"))
+        if key in wanted
+    )
+
+
+def _schema_matches(existing, collection_obj):
+    """Return True if existing (a CollectionConfig) has the vectorizer and
+    generative modules, their options, and the properties that collection_obj
+    asks for."""
+    if existing is None or existing.vectorizer_config is None:
+        return False
+    vectorizer = collection_obj["vectorizer"]
+    vectorizer_options = dict(collection_obj["moduleConfig"][vectorizer])
+    # Weaviate vectorizes the class name unless told otherwise
+    vectorize_class_name = vectorizer_options.pop("vectorizeClassName", True)
+    wanted_generative = next((name for name in collection_obj["moduleConfig"] if name.startswith("generative-")), None)
+    generative = existing.generative_config
+    return (
+        existing.vectorizer == vectorizer
+        and _options_match(existing.vectorizer_config.model, vectorizer_options)
+        and existing.vectorizer_config.vectorize_collection_name == vectorize_class_name
+        and (generative.generative if generative else None) == wanted_generative
+        and (generative is None or _options_match(generative.model, collection_obj["moduleConfig"][wanted_generative]))
+        and [(prop.name, prop.data_type) for prop in existing.properties]
+        == [(prop["name"], prop["dataType"][0]) for prop in collection_obj["properties"]]
+        and all(
+            _property_vectorizer_matches(prop.vectorizer_config, wanted.get("moduleConfig", {}).get(vectorizer, {}))
+            for prop, wanted in zip(existing.properties, collection_obj["properties"])
+        )
+    )
 
 
 def setup_collection(client):
-    """Set up a collection with text2vec-openai vectorizer."""
+    """Set up a collection with text2vec-openai vectorizer.
+    
+    An existing collection with the same schema is kept, so its objects (and
+    their embeddings) survive across runs.
+    """
     try:
-        # Try to get the collection to see if it exists
-        logger.info(f"Checking if collection {COLLECTION_NAME} exists")
-        
-        try:
-            # Use the REST API directly
-            response = client._connection.get(f"v1/collections/{COLLECTION_NAME}")
-            
-            if response.status_code == 200:
-                # Collection exists, delete it
-                logger.info(f"Collection {COLLECTION_NAME} exists, deleting it")
-                delete_response = client._connection.delete(f"v1/collections/{COLLECTION_NAME}")
-                
-                if delete_response.status_code == 200:
-                    logger.info(f"Collection {COLLECTION_NAME} deleted successfully")
-                else:
-                    logger.warning(f"Failed to delete collection: {delete_response.status_code} - {delete_response.text}")
-                    time.sleep(1)  # Wait a bit before trying to create
-            elif response.status_code != 404:
-                logger.warning(f"Unexpected response when checking collection: {response.status_code} - {response.text}")
-        except Exception as e:
-            logger.info(f"Collection check failed, assuming it doesn't exist: {e}")
-        
-        # Create a new collection with text2vec-openai vectorizer
-        logger.info(f"Creating collection {COLLECTION_NAME} with text2vec-openai vectorizer")
-        
         collection_obj = {
-            "name": COLLECTION_NAME,
+            "class": COLLECTION_NAME,
             "description": "AI-related articles for demonstration",
             "vectorizer": "text2vec-openai",
-            "vectorizerConfig": {
-                "model": "text-embedding-3-small",
-                "type": "text"
-            },
             "moduleConfig": {
+                "text2vec-openai": {
+                    "model": "text-embedding-3-small",
+                    "type": "text",
+                    # title and content are already embedded together in one
+                    # request per object; the class name adds only tokens
+                    "vectorizeClassName": False
+                },
                 "generative-openai": {
                     "model": "gpt-3.5-turbo"
                 }
@@ -174,14 +228,21 @@ def setup_collection(client):
             ]
         }
         
-        response = client._connection.post("v1/collections", collection_obj)
-        
-        if response.status_code == 200:
-            logger.info(f"Collection {COLLECTION_NAME} created successfully")
+        # One request for this collection's config covers both the existence
+        # and the schema check
+        existing = _existing_config(client)
+        if _schema_matches(existing, collection_obj):
+            logger.info(f"Collection {COLLECTION_NAME} already exists with the same schema; keeping it")
             return True
-        else:
-            logger.error(f"Failed to create collection: {response.status_code} - {response.text}")
-            return False
+        
+        # Drop any previous copy; deleting a missing collection is a no-op
+        client.collections.delete(COLLECTION_NAME)
+        
+        # Create a new collection with text2vec-openai vectorizer
+        logger.info(f"Creating collection {COLLECTION_NAME} with text2vec-openai vectorizer")
+        client.collections.create_from_dict(collection_obj)
+        logger.info(f"Collection {COLLECTION_NAME} created successfully")
+        return True
     except Exception as e:
         logger.error(f"Error setting up collection: {e}")
         return False
@@ -208,29 +269,34 @@ def add_sample_data(client):
             }
         ]
         
-        for idx, data in enumerate(sample_data):
-            logger.info(f"Adding article {idx+1}: {data['title']}")
-            
-            # Generate a UUID for the object
-            object_uuid = str(uuid.uuid4())
-            
-            # Add the data object
-            response = client._connection.post(
-                f"v1/collections/{COLLECTION_NAME}/objects",
-                {
-                    "id": object_uuid,
-                    "properties": data
-                }
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Article {idx+1} added successfully")
-            else:
-                logger.warning(f"Failed to add article {idx+1}: {response.status_code} - {response.text}")
+        logger.info("Adding %d sample articles to %s", len(sample_data), COLLECTION_NAME)
+        if logger.isEnabledFor(logging.DEBUG):
+            for idx, data in enumerate(sample_data):
+                logger.debug("Adding article %d: %s", idx + 1, data["title"])
+        
+        failed = []
+        
+        def log_failure(properties, message):
+            failed.append(properties)
+            logger.warning(f"Failed to add article {properties.get('title')}: {message}")
+        
+        # Articles go to the server in batches rather than one POST each, with
+        # several batches in flight so the vectorizer is never left idle; the
+        # UUID comes from the title so re-running the demo overwrites them
+        batch_import(
+            client,
+            COLLECTION_NAME,
+            ((data, uuid.uuid5(uuid.NAMESPACE_URL, data["title"])) for data in sample_data),
+            on_error=log_failure,
+            batch_size=BATCH_SIZE,
+            concurrent_requests=CONCURRENT_REQUESTS
+        )
+        added = len(sample_data) - len(failed)
+        logger.info("Inserted %d articles", added)
         
         # Wait for indexing to complete
         logger.info("Waiting for indexing to complete...")
-        time.sleep(2)
+        wait_for_object_count(client, COLLECTION_NAME, added)
         
         return True
     except Exception as e:
@@ -238,145 +304,108 @@ def add_sample_data(client):
         return False
 
 
-def demonstrate_vector_search(client):
-    """Demonstrate vector search with text2vec-openai."""
+def _vector_search(client, query):
+    """Return up to two articles close to query."""
+    # nearText over gRPC; the query is sent as data, not spliced into GraphQL
+    return client.collections.get(COLLECTION_NAME).query.near_text(
+        query=query,
+        certainty=0.7,
+        limit=2,
+        return_properties=["title", "content", "category"],
+        return_metadata=MetadataQuery(certainty=True)
+    ).objects
+
+
+def _generative_search(client, query):
+    """Return the article closest to query, with a simplified explanation generated for it."""
+    return client.collections.get(COLLECTION_NAME).generate.near_text(
+        query=query,
+        limit=1,
+        single_prompt=SIMPLIFY_PROMPT,
+        return_properties=["title", "content"]
+    ).objects
+
+
+def _standalone_generate(client, prompt):
+    """Send prompt to the generative-openai module and return the raw response."""
+    return client._connection.post(
+        "v1/modules/generative-openai/generate",
+        {
+            "prompt": prompt
+        }
+    )
+
+
+def demonstrate_vector_search(client, articles_future=None):
+    """Demonstrate vector search with text2vec-openai.
+    
+    articles_future, if given, holds a _vector_search already in flight.
+    """
     logger.info("\n=== DEMONSTRATING VECTOR SEARCH WITH TEXT2VEC-OPENAI ===\n")
     
     try:
-        query = "What are the ethical considerations in AI?"
+        query = VECTOR_SEARCH_QUERY
         logger.info(f"Performing semantic search with query: '{query}'")
         
-        response = client._connection.post(
-            "v1/graphql",
-            {
-                "query": f"""
-                {{
-                  Get {{
-                    {COLLECTION_NAME}(
-                      nearText: {{
-                        concepts: ["{query}"]
-                        certainty: 0.7
-                      }}
-                      limit: 2
-                    ) {{
-                      title
-                      content
-                      category
-                      _additional {{
-                        certainty
-                      }}
-                    }}
-                  }}
-                }}
-                """
-            }
-        )
+        articles = articles_future.result() if articles_future is not None else _vector_search(client, query)
         
-        if response.status_code == 200:
-            data = response.json()
-            
-            if "data" in data and "Get" in data["data"] and COLLECTION_NAME in data["data"]["Get"]:
-                articles = data["data"]["Get"][COLLECTION_NAME]
-                logger.info(f"Found {len(articles)} relevant articles:")
-                
-                for idx, article in enumerate(articles):
-                    certainty = article["_additional"]["certainty"] if "_additional" in article and "certainty" in article["_additional"] else "N/A"
-                    logger.info(f"  {idx+1}. {article['title']} (Category: {article['category']}, Certainty: {certainty})")
-                    logger.info(f"     Content: {article['content'][:100]}...")
-            else:
-                logger.warning("No results found or unexpected response structure")
+        if articles:
+            # One log record for the whole result list rather than two per article
+            lines = [f"Found {len(articles)} relevant articles:"]
+            for idx, article in enumerate(articles):
+                certainty = article.metadata.certainty if article.metadata.certainty is not None else "N/A"
+                lines.append(f"  {idx+1}. {article.properties['title']} (Category: {article.properties['category']}, Certainty: {certainty})")
+                lines.append(f"     Content: {article.properties['content'][:100]}...")
+            logger.info("\n".join(lines))
         else:
-            logger.warning(f"Search failed: {response.status_code} - {response.text}")
+            logger.warning("No results found")
     except Exception as e:
         logger.error(f"Error demonstrating vector search: {e}")
 
 
-def demonstrate_generative_search(client):
-    """Demonstrate generative search with generative-openai."""
+def demonstrate_generative_search(client, articles_future=None):
+    """Demonstrate generative search with generative-openai.
+    
+    articles_future, if given, holds a _generative_search already in flight.
+    """
     logger.info("\n=== DEMONSTRATING GENERATIVE AI WITH GENERATIVE-OPENAI ===\n")
     
     try:
-        query = "What are vector databases?"
+        query = GENERATIVE_SEARCH_QUERY
         logger.info(f"Performing generative search with query: '{query}'")
         
-        response = client._connection.post(
-            "v1/graphql",
-            {
-                "query": f"""
-                {{
-                  Get {{
-                    {COLLECTION_NAME}(
-                      nearText: {{
-                        concepts: ["{query}"]
-                      }}
-                      limit: 1
-                    ) {{
-                      title
-                      content
-                      _additional {{
-                        generate(
-                          singleResult: {{
-                            prompt: "Explain this in simpler terms:"
-                          }}
-                        ) {{
-                          singleResult
-                          error
-                        }}
-                      }}
-                    }}
-                  }}
-                }}
-                """
-            }
-        )
+        articles = articles_future.result() if articles_future is not None else _generative_search(client, query)
         
-        if response.status_code == 200:
-            data = response.json()
+        if articles:
+            article = articles[0]
+            logger.info(f"Article: {article.properties['title']}")
+            logger.info(f"Original content: {article.properties['content']}")
             
-            if "data" in data and "Get" in data["data"] and COLLECTION_NAME in data["data"]["Get"]:
-                articles = data["data"]["Get"][COLLECTION_NAME]
-                
-                if articles:
-                    article = articles[0]
-                    logger.info(f"Article: {article['title']}")
-                    logger.info(f"Original content: {article['content']}")
-                    
-                    if "_additional" in article and "generate" in article["_additional"]:
-                        generated = article["_additional"]["generate"]
-                        
-                        if "singleResult" in generated:
-                            logger.info(f"\nSimplified explanation: {generated['singleResult']}")
-                        elif "error" in generated:
-                            logger.error(f"Generation error: {generated['error']}")
-                    else:
-                        logger.warning("No generated content found")
-                else:
-                    logger.warning("No articles found")
+            if article.generated:
+                logger.info(f"\nSimplified explanation: {article.generated}")
             else:
-                logger.warning("No results found or unexpected response structure")
+                logger.warning("No generated content found")
         else:
-            logger.warning(f"Generate query failed: {response.status_code} - {response.text}")
+            logger.warning("No articles found")
     except Exception as e:
         logger.error(f"Error demonstrating generative search: {e}")
 
 
-def demonstrate_standalone_generation(client):
-    """Demonstrate standalone text generation with generative-openai."""
+def demonstrate_standalone_generation(client, response_future=None):
+    """Demonstrate standalone text generation with generative-openai.
+    
+    response_future, if given, holds a _standalone_generate already in flight.
+    """
     logger.info("\n=== DEMONSTRATING STANDALONE GENERATIVE AI ===\n")
     
     try:
-        prompt = "Explain the concept of vector embeddings in AI in 3 sentences."
+        prompt = STANDALONE_PROMPT
         logger.info(f"Using generative-openai module with prompt: '{prompt}'")
         
-        response = client._connection.post(
-            "v1/modules/generative-openai/generate",
-            {
-                "prompt": prompt
-            }
-        )
+        response = response_future.result() if response_future is not None else _standalone_generate(client, prompt)
         
         if response.status_code == 200:
-            data = response.json()
+            data = response_json(response)
             
             if "result" in data:
                 logger.info(f"Generated response: {data['result']}")
@@ -405,7 +434,7 @@ def main():
         # Check for OpenAI modules
         openai_modules = check_openai_modules(client)
         
-        if not openai_modules or "text2vec-openai" not in openai_modules or "generative-openai" not in openai_modules:
+        if not REQUIRED_MODULES <= openai_modules:
             logger.error("Required OpenAI modules not available")
             sys.exit(1)
         
@@ -419,14 +448,21 @@ def main():
             logger.error("Failed to add sample data")
             sys.exit(1)
         
-        # Demonstrate vector search with text2vec-openai
-        demonstrate_vector_search(client)
-        
-        # Demonstrate generative search with generative-openai
-        demonstrate_generative_search(client)
-        
-        # Demonstrate standalone text generation with generative-openai
-        demonstrate_standalone_generation(client)
+        # The three demos are independent round trips, so send them all at
+        # once and report them in order as they come back
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            vector_future = executor.submit(_vector_search, client, VECTOR_SEARCH_QUERY)
+            generative_future = executor.submit(_generative_search, client, GENERATIVE_SEARCH_QUERY)
+            standalone_future = executor.submit(_standalone_generate, client, STANDALONE_PROMPT)
+            
+            # Demonstrate vector search with text2vec-openai
+            demonstrate_vector_search(client, vector_future)
+            
+            # Demonstrate generative search with generative-openai
+            demonstrate_generative_search(client, generative_future)
+            
+            # Demonstrate standalone text generation with generative-openai
+            demonstrate_standalone_generation(client, standalone_future)
         
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
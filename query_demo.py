@@ -3,10 +3,11 @@
 import os
 import sys
 import logging
-import json
-from dotenv import load_dotenv
+from collections import defaultdict
+from config import settings
 import weaviate
 from weaviate.auth import AuthApiKey
+from weaviate_client import CONN_CONFIG, CONN_HEADERS, cached_get_meta
 
 # Set up logging
 logging.basicConfig(
@@ -22,16 +23,31 @@ logger = logging.getLogger("WeaviateQueryDemo")
 ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-# Load environment variables
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL or WEAVIATE_API_KEY")
     sys.exit(1)
 
+# GraphQL document for the first object IDs of a class, built once. The class
+# name is part of the document (GraphQL has no variables for type names), so
+# only it is filled in per call
+OBJECT_IDS_QUERY = """
+{
+  Get {
+    %s(limit: 3) {
+      _additional {
+        id
+      }
+    }
+  }
+}
+"""
+
 
 def main():
     """Main function to demonstrate querying Weaviate."""
@@ -45,12 +61,12 @@ def main():
         client = weaviate.connect_to_weaviate_cloud(
             cluster_url=weaviate_url,
             auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-            headers={
-                "X-OpenAI-Api-Key": openai_api_key  # For OpenAI modules
-            }
+            headers=CONN_HEADERS,  # OpenAI key header, omitted when unset
+            additional_config=CONN_CONFIG  # keep-alive pool for the REST calls below
         )
         
-        # Check if client is ready
+        # Check if client is ready; this also opens the pooled connection the
+        # meta, schema and GraphQL requests below reuse
         is_ready = client.is_ready()
         logger.info(f"Connection status: {is_ready}")
         
@@ -60,7 +76,7 @@ def main():
         
         # Get meta information
         logger.info("Retrieving meta information")
-        meta = client.get_meta()
+        meta = cached_get_meta(client)
         
         # Print Weaviate version
         if 'version' in meta:
@@ -71,19 +87,17 @@ def main():
             modules = meta['modules']
             logger.info(f"Found {len(modules)} modules:")
             
-            # Group modules by type
-            module_groups = {}
+            # Group modules by type; sorting once up front leaves every group sorted
+            module_groups = defaultdict(list)
             
-            for module_name in modules:
-                prefix = module_name.split('-')[0] if '-' in module_name else "other"
-                if prefix not in module_groups:
-                    module_groups[prefix] = []
-                module_groups[prefix].append(module_name)
+            for module_name in sorted(modules):
+                prefix, sep, _ = module_name.partition('-')
+                module_groups[prefix if sep else "other"].append(module_name)
             
             # Print modules by group
             for group, group_modules in module_groups.items():
                 logger.info(f"  {group.upper()} MODULES:")
-                for module in sorted(group_modules):
+                for module in group_modules:
                     logger.info(f"    - {module}")
         else:
             logger.warning("No modules found in Weaviate meta information")
@@ -129,19 +143,7 @@ def main():
                 # Use the query API
                 result = client._connection.post(
                     "graphql",
-                    {
-                        "query": f"""
-                        {{
-                          Get {{
-                            {first_class}(limit: 3) {{
-                              _additional {{
-                                id
-                              }}
-                            }}
-                          }}
-                        }}
-                        """
-                    }
+                    {"query": OBJECT_IDS_QUERY % first_class}
                 )
                 
                 if result.status_code == 200:
@@ -153,8 +155,9 @@ def main():
                         
                         # Print object IDs
                         for idx, obj in enumerate(objects):
-                            if "_additional" in obj and "id" in obj["_additional"]:
-                                logger.info(f"  Object {idx+1} ID: {obj['_additional']['id']}")
+                            object_id = (obj.get("_additional") or {}).get("id")
+                            if object_id:
+                                logger.info("  Object %d ID: %s", idx + 1, object_id)
                     else:
                         logger.warning(f"No objects found in class {first_class}")
                 else:
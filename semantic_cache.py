@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import math
+import time
+import shelve
+import hashlib
+import sqlite3
+import logging
+import threading
+import functools
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from config import ROOT
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; fall back to a pure-Python scan
+    np = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib codec
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.path.join(ROOT, ".semantic_cache.sqlite3")
+# Query embeddings shared across runs: {sha256(model:text): embedding}
+EMBEDDING_CACHE_PATH = os.path.join(ROOT, ".embedding_cache")
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Small CPU model for embedding collection objects and queries in-process
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Cosine similarity at or above which a new question reuses a cached answer
+DEFAULT_THRESHOLD = 0.85
+# Seconds a cached answer stays valid, and answers kept per namespace
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 1000
+
+# Punctuation and whitespace runs, dropped by canonical_text
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Embeddings already looked up in this process, keyed like the disk cache
+_EMBEDDINGS: Dict[str, List[float]] = {}
+# The shelve file may be opened only once at a time, so threads take turns
+_EMBEDDING_CACHE_LOCK = threading.Lock()
+
+
+def canonical_text(text: str) -> str:
+    """Lowercase text, drop punctuation and collapse whitespace.
+
+    Questions that differ only in case or punctuation ("What is AI?" and
+    "what is AI") then share one embedding and one semantic cache entry.
+    """
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text.lower())).strip()
+
+
+def _normalize(vector: List[float]) -> array:
+    """Scale vector to unit length, stored as float32."""
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return array("f", (x / norm for x in vector))
+
+
+def _dumps(payload: Dict[str, Any]) -> str:
+    """Encode a cache payload as JSON text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload)
+
+
+def _loads(encoded: str) -> Dict[str, Any]:
+    """Decode a cache payload, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(encoded)
+    return json.loads(encoded)
+
+
+def embed_texts(openai_client, texts: Sequence[str]) -> List[array]:
+    """Return unit-length embeddings of texts from a single embeddings request."""
+    response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=list(texts))
+    return [_normalize(item.embedding) for item in response.data]
+
+
+def cached_embedding(openai_client, text: str) -> List[float]:
+    """Return the EMBEDDING_MODEL embedding of text, embedding it only once.
+
+    Embeddings are kept in memory and in a shelve file under ROOT, so
+    repeated queries skip the embeddings request on later runs as well.
+    text is embedded in its canonical_text form.
+    """
+    text = canonical_text(text)
+    key = hashlib.sha256(f"{EMBEDDING_MODEL}:{text}".encode()).hexdigest()
+    if key in _EMBEDDINGS:
+        return _EMBEDDINGS[key]
+
+    with _EMBEDDING_CACHE_LOCK, shelve.open(EMBEDDING_CACHE_PATH) as db:
+        vector = db.get(key)
+    if vector is None:
+        # Embedded outside the lock so other threads' lookups are not held up
+        response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=[text])
+        vector = response.data[0].embedding
+        with _EMBEDDING_CACHE_LOCK, shelve.open(EMBEDDING_CACHE_PATH) as db:
+            db[key] = vector
+    _EMBEDDINGS[key] = vector
+    return vector
+
+
+@functools.lru_cache(maxsize=1)
+def local_embedder():
+    """Load the local sentence-transformer once; None if it is not installed."""
+    # Imported here rather than at module level: it pulls in torch, which
+    # scripts that never embed locally should not pay for
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:  # sentence-transformers is optional; Weaviate embeds with OpenAI instead
+        return None
+    return SentenceTransformer(LOCAL_EMBEDDING_MODEL)
+
+
+def _quantize(vector: array) -> Tuple[array, float]:
+    """Return (int8 row, scale) such that row * scale approximates vector."""
+    scale = max(map(abs, vector)) / 127 or 1.0
+    return array("b", (round(x / scale) for x in vector)), scale
+
+
+class VectorMatrix:
+    """Unit vectors searched by dot product, using NumPy when it is installed.
+
+    Rows are stored as int8 with a per-row scale, a quarter of the float32
+    size; scores are rescaled back, which keeps them within about 1e-3 of
+    the exact cosine similarity.
+    """
+
+    def __init__(self, vectors: Iterable[array] = ()):
+        self._rows: List[array] = []
+        self._scales: List[float] = []
+        self._matrix = None
+        for vector in vectors:
+            self.append(vector)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def append(self, vector: array) -> None:
+        row, scale = _quantize(vector)
+        self._rows.append(row)
+        self._scales.append(scale)
+        self._matrix = None
+
+    def drop_oldest(self, count: int) -> None:
+        """Remove the first count rows."""
+        del self._rows[:count]
+        del self._scales[:count]
+        self._matrix = None
+
+    def best_match(self, vector: array) -> Tuple[float, int]:
+        """Return (cosine similarity, index) of the row closest to vector."""
+        query, query_scale = _quantize(vector)
+        if np is not None:
+            if self._matrix is None:
+                matrix = np.frombuffer(b"".join(row.tobytes() for row in self._rows), dtype=np.int8)
+                self._matrix = (matrix.reshape(len(self._rows), -1), np.array(self._scales, dtype=np.float32))
+            matrix, scales = self._matrix
+            # Accumulate in int32 so the int8 products cannot overflow
+            dots = np.matmul(matrix, np.frombuffer(query, dtype=np.int8), dtype=np.int32)
+            scores = dots * scales * query_scale
+            index = int(scores.argmax())
+            return float(scores[index]), index
+        return max(
+            (sum(a * b for a, b in zip(row, query)) * scale * query_scale, index)
+            for index, (row, scale) in enumerate(zip(self._rows, self._scales))
+        )
+
+
+class SemanticCache:
+    """Answers to earlier questions, looked up by embedding similarity.
+
+    Entries live in SQLite so they survive restarts, and are kept in memory
+    as unit vectors so a lookup is a single dot-product scan. Each cache is
+    scoped to a namespace (e.g. the collection the answers came from).
+
+    Answers expire ttl seconds after they were added, and only the newest
+    max_entries answers of a namespace are kept.
+    """
+
+    def __init__(self, namespace: str, openai_client, threshold: float = DEFAULT_THRESHOLD,
+                 path: str = CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.namespace = namespace
+        self.openai_client = openai_client
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "namespace TEXT NOT NULL, question TEXT NOT NULL, vector BLOB NOT NULL, payload TEXT NOT NULL, "
+            "created_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}
+        if "created_at" not in columns:
+            # Caches written before entries expired; their rows count as expired
+            with self._db:
+                self._db.execute("ALTER TABLE entries ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+
+        # Oldest first, so expired and surplus entries are always a prefix
+        rows = self._db.execute(
+            "SELECT vector, payload, created_at FROM entries WHERE namespace = ? AND created_at >= ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (namespace, time.time() - ttl, max_entries)
+        ).fetchall()[::-1]
+        self._vectors = VectorMatrix(array("f", blob) for blob, _, _ in rows)
+        self._payloads = [payload for _, payload, _ in rows]
+        self._created = [created_at for _, _, created_at in rows]
+        logger.info(f"Loaded {len(rows)} cached answers for {namespace}")
+
+    def _evict(self) -> None:
+        """Drop expired entries and the oldest ones beyond max_entries."""
+        cutoff = time.time() - self.ttl
+        expired = next((i for i, created_at in enumerate(self._created) if created_at >= cutoff), len(self._created))
+        count = max(expired, len(self._created) - self.max_entries)
+        if count <= 0:
+            return
+
+        self._vectors.drop_oldest(count)
+        del self._payloads[:count]
+        del self._created[:count]
+        with self._db:
+            self._db.execute(
+                "DELETE FROM entries WHERE namespace = ? AND (created_at < ? OR rowid NOT IN ("
+                "SELECT rowid FROM entries WHERE namespace = ? ORDER BY created_at DESC LIMIT ?))",
+                (self.namespace, cutoff, self.namespace, self.max_entries)
+            )
+
+    def embed(self, text: str) -> Optional[array]:
+        """Return the unit-length embedding of canonical_text(text), or None if embedding fails.
+
+        Goes through cached_embedding, so a search for the same text reuses it.
+        """
+        try:
+            return _normalize(cached_embedding(self.openai_client, text))
+        except Exception as e:
+            logger.warning(f"Could not embed question for the semantic cache: {e}")
+            return None
+
+    def lookup(self, vector: Optional[array]) -> Optional[Dict[str, Any]]:
+        """Return the payload cached for the closest earlier question, if close enough."""
+        self._evict()
+        if vector is None or not self._vectors:
+            return None
+
+        similarity, index = self._vectors.best_match(vector)
+        if similarity < self.threshold:
+            return None
+        logger.info(f"Semantic cache hit (similarity {similarity:.3f})")
+        return _loads(self._payloads[index])
+
+    def add(self, question: str, vector: Optional[array], payload: Dict[str, Any]) -> None:
+        """Cache payload as the answer to question."""
+        if vector is None:
+            return
+
+        encoded = _dumps(payload)
+        created_at = time.time()
+        with self._db:
+            self._db.execute(
+                "INSERT INTO entries (namespace, question, vector, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, question, vector.tobytes(), encoded, created_at)
+            )
+        self._vectors.append(vector)
+        self._payloads.append(encoded)
+        self._created.append(created_at)
+        self._evict()
+
+    def get_or_add(self, question: str, compute: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Return the payload cached for a question close to question, or
+        compute() and cache its result (unless it is None)."""
+        vector = self.embed(question)
+        cached = self.lookup(vector)
+        if cached is not None:
+            return cached
+
+        payload = compute()
+        if payload is not None:
+            self.add(question, vector, payload)
+        return payload
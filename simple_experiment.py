@@ -2,14 +2,15 @@
 
 import os
 import sys
-import time
 import logging
-import json
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any
-from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
+from config import settings
+import openai
+from semantic_cache import SemanticCache, cached_embedding, embed_texts
+from weaviate.classes.data import DataObject
+from weaviate_client import cached_get_meta, get_client, wait_for_object_count
 
 # Set up logging
 logging.basicConfig(
@@ -25,104 +26,99 @@ logger = logging.getLogger("WeaviateExperiment")
 ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-# Load environment variables
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL or WEAVIATE_API_KEY")
     sys.exit(1)
 
+# Modules the OpenAI experiment needs
+REQUIRED_MODULES = frozenset({"text2vec-openai", "generative-openai"})
+
+# Binary-quantized HNSW index: vectors are compared as bit codes, with the full
+# vectors only used to rescore candidates. Unlike PQ, BQ needs no training set,
+# so it works from the first object of this small test class
+VECTOR_INDEX_CONFIG = {"distance": "cosine", "bq": {"enabled": True}}
+
 
 def connect_to_weaviate():
-    """Connect to Weaviate Cloud and return the client."""
+    """Return the process-wide Weaviate client, connecting on first use."""
     try:
         logger.info(f"Connecting to Weaviate at {weaviate_url}")
-        
-        # Connect to Weaviate using the client API
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=weaviate_url,
-            auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-            headers={
-                "X-OpenAI-Api-Key": openai_api_key  # For OpenAI modules
-            }
-        )
-        
-        # Check if client is ready
-        is_ready = client.is_ready()
-        logger.info(f"Connection status: {is_ready}")
-        
-        if not is_ready:
-            logger.error("Weaviate client is not ready")
-            sys.exit(1)
-            
-        return client
-            
+        return get_client()
     except Exception as e:
         logger.error(f"Error connecting to Weaviate: {e}")
         sys.exit(1)
 
 
 def get_available_modules(client):
-    """Get all available modules from the Weaviate instance."""
+    """Return the names of the modules available on the Weaviate instance as a frozenset."""
     try:
         logger.info("Retrieving available modules from Weaviate")
         
         # Get meta information
-        meta = client.get_meta()
+        meta = cached_get_meta(client)
         
         # Extract modules from meta response
         if 'modules' in meta:
-            modules = list(meta['modules'].keys())
-            logger.info(f"Found {len(modules)} modules: {', '.join(modules)}")
+            modules = frozenset(meta['modules'])
+            logger.info(f"Found {len(modules)} modules: {', '.join(meta['modules'])}")
             return modules
         else:
             logger.warning("No modules found in Weaviate meta information")
-            return []
+            return frozenset()
             
     except Exception as e:
         logger.error(f"Error retrieving modules: {e}")
-        return []
+        return frozenset()
 
 
-def list_schema(client):
-    """List the current schema in Weaviate."""
+def list_schema(client, schema=None):
+    """List the current schema in Weaviate.
+    
+    schema is a client.collections.list_all(simple=False) result to list
+    instead of fetching it again. Returns the schema listed, or an empty
+    dict if it could not be retrieved.
+    """
     try:
-        logger.info("Retrieving current schema from Weaviate")
-        
-        # Get schema
-        schema = client.schema.get()
+        if schema is None:
+            logger.info("Retrieving current schema from Weaviate")
+            schema = client.collections.list_all(simple=False)
         
         # Print classes
-        if 'classes' in schema and schema['classes']:
-            classes = schema['classes']
-            logger.info(f"Found {len(classes)} classes:")
-            for cls in classes:
-                logger.info(f"  - {cls['class']}: {cls.get('description', 'No description')}")
-                if 'properties' in cls:
-                    for prop in cls['properties']:
-                        logger.info(f"    - {prop['name']}: {prop['dataType']}")
+        if schema:
+            logger.info(f"Found {len(schema)} classes:")
+            for name, config in schema.items():
+                logger.info(f"  - {name}: {config.description or 'No description'}")
+                for prop in config.properties:
+                    logger.info(f"    - {prop.name}: {prop.data_type.value}")
         else:
             logger.info("No classes found in schema")
+        return schema
             
     except Exception as e:
         logger.error(f"Error retrieving schema: {e}")
+        return {}
 
 
-def experiment_with_openai_modules(client):
-    """Experiment with OpenAI modules (text2vec-openai and generative-openai)."""
+def experiment_with_openai_modules(client, existing_classes):
+    """Experiment with OpenAI modules (text2vec-openai and generative-openai).
+    
+    existing_classes is the set of class names already in the schema.
+    """
     class_name = "AIExperiment"
+    # Used to embed the test objects and the queries client-side
+    openai_client = openai.OpenAI(api_key=openai_api_key)
     
     try:
         # Check if class already exists and delete it
-        schema = client.schema.get()
-        classes = [cls['class'] for cls in schema['classes']] if 'classes' in schema else []
-        
-        if class_name in classes:
+        if class_name in existing_classes:
             logger.info(f"Deleting existing class: {class_name}")
-            client.schema.delete_class(class_name)
+            client.collections.delete(class_name)
         
         # Create class with text2vec-openai vectorizer
         logger.info("Creating schema with text2vec-openai vectorizer")
@@ -131,16 +127,23 @@ def experiment_with_openai_modules(client):
             "class": class_name,
             "description": "Test class for OpenAI modules",
             "vectorizer": "text2vec-openai",
+            "vectorIndexConfig": VECTOR_INDEX_CONFIG,
             "moduleConfig": {
                 "text2vec-openai": {
-                    "model": "ada",
-                    "modelVersion": "002",
+                    # Same model as semantic_cache.cached_embedding, so queries can
+                    # be embedded (and cached) client-side and sent as nearVector
+                    "model": "text-embedding-3-small",
                     "type": "text"
                 },
                 "generative-openai": {
                     "model": "gpt-3.5-turbo"
                 }
             },
+            # A single replica: the throwaway class is rebuilt on every run, so
+            # there is no point building its index on more than one node
+            "replicationConfig": {
+                "factor": 1
+            },
             "properties": [
                 {
                     "name": "title",
@@ -168,9 +171,20 @@ def experiment_with_openai_modules(client):
         }
         
         # Create the class
-        client.schema.create_class(class_obj)
+        collection = client.collections.create_from_dict(class_obj)
         logger.info(f"Schema created successfully: {class_name}")
         
+        # Confirm the server built the binary-quantized index rather than
+        # falling back to full vectors
+        created = collection.config.get()
+        index_config = created.to_dict().get("vectorIndexConfig", {})
+        if index_config.get("bq", {}).get("enabled"):
+            logger.info(f"{class_name} uses a BQ vector index")
+        else:
+            logger.warning(f"{class_name} was created without BQ: {index_config}")
+        if created.replication_config.factor != 1:
+            logger.warning(f"{class_name} was created with replication factor {created.replication_config.factor}")
+        
         # Add test data
         test_data = [
             {
@@ -189,73 +203,84 @@ def experiment_with_openai_modules(client):
         
         logger.info(f"Adding {len(test_data)} test objects to {class_name}")
         
-        # Use batch processing to add data
-        with client.batch as batch:
-            batch.batch_size = 10
-            
+        if logger.isEnabledFor(logging.DEBUG):
             for idx, data in enumerate(test_data):
-                logger.info(f"Adding object {idx+1}: {data['title']}")
-                
-                # Generate a UUID for the object
-                object_uuid = str(uuid.uuid4())
-                
-                # Add the data object to the batch
-                batch.add_data_object(
-                    data_object=data,
-                    class_name=class_name,
-                    uuid=object_uuid
-                )
+                logger.debug("Adding object %d: %s", idx + 1, data["title"])
+        
+        # Embed every object in one embeddings request and send the vectors
+        # along, so Weaviate does not call OpenAI once per object
+        vectors = embed_texts(openai_client, [f"{data['title']} {data['content']}" for data in test_data])
         
-        logger.info("Test data added successfully")
+        # The handful of objects fits in one insert_many request, which skips the
+        # batcher's background queue. The UUID comes from the title so reruns
+        # overwrite the same object
+        result = client.collections.get(class_name).data.insert_many([
+            DataObject(properties=data, uuid=uuid.uuid5(uuid.NAMESPACE_URL, data["title"]), vector=vector.tolist())
+            for data, vector in zip(test_data, vectors)
+        ])
+        if result.has_errors:
+            first_error = next(iter(result.errors.values()))
+            logger.warning(f"Failed to add {len(result.errors)} of {len(test_data)} objects: {first_error.message}")
+        
+        logger.info(f"Added {len(test_data) - len(result.errors)} objects to {class_name}")
         
         # Wait for indexing to complete
-        time.sleep(2)
+        wait_for_object_count(client, class_name, len(test_data) - len(result.errors))
         
-        # Perform a vector search
+        # Vector search results are cached by question similarity for a few
+        # minutes (see SemanticCache), so a quick rerun skips the search
         query = "What is AI?"
-        logger.info(f"Performing vector search with query: '{query}'")
+        prompt = "Summarize this text: {content}"
+        collection = client.collections.get(class_name)
         
-        result = client.query.get(
-            class_name, ["title", "content"]
-        ).with_near_text({
-            "concepts": [query]
-        }).with_limit(2).do()
+        def vector_search():
+            response = collection.query.near_vector(
+                # Cached query embedding; the server need not call OpenAI for it
+                near_vector=cached_embedding(openai_client, query),
+                limit=2,
+                return_properties=["title", "content"]
+            )
+            return {"objects": [obj.properties for obj in response.objects]}
         
-        # Process and log results
-        if "data" in result and "Get" in result["data"]:
-            objects = result["data"]["Get"][class_name]
-            logger.info(f"Found {len(objects)} results")
-            
-            for idx, obj in enumerate(objects):
-                logger.info(f"Result {idx+1}: {obj['title']} - {obj['content'][:50]}...")
-        else:
-            logger.warning(f"No results found or unexpected response structure")
-            logger.debug(f"Response: {json.dumps(result, indent=2)}")
+        def generative_search():
+            response = collection.generate.fetch_objects(
+                limit=2,
+                single_prompt=prompt,
+                return_properties=["title", "content"]
+            )
+            return {"objects": [{**obj.properties, "generated": obj.generated} for obj in response.objects]}
+        
+        # The cache is opened on the thread that uses it (SQLite connections
+        # stay on their own thread)
+        def cached_vector_search():
+            return SemanticCache(f"{class_name}:near_text", openai_client).get_or_add(query, vector_search)
         
-        # Perform a generative query
+        # The two queries are independent, so run both at once and report
+        # them in order afterwards
+        logger.info(f"Performing vector search with query: '{query}'")
         logger.info("Performing generative query with generative-openai")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            vector_future = executor.submit(cached_vector_search)
+            # Not cached: the only key would be the fixed prompt template, which
+            # would match on every run whatever objects were fetched
+            generative_future = executor.submit(generative_search)
+        
+        # Process and log results
+        objects = vector_future.result()["objects"]
+        logger.info(f"Found {len(objects)} results")
         
-        result = client.query.get(
-            class_name, ["title", "content"]
-        ).with_generate(
-            single_prompt="Summarize this text:",
-            properties=["content"]
-        ).with_limit(2).do()
+        for idx, obj in enumerate(objects):
+            logger.info(f"Result {idx+1}: {obj['title']} - {obj['content'][:50]}...")
         
         # Process and log results
-        if "data" in result and "Get" in result["data"]:
-            objects = result["data"]["Get"][class_name]
-            logger.info(f"Found {len(objects)} results")
-            
-            for idx, obj in enumerate(objects):
-                if "_additional" in obj and "generate" in obj["_additional"]:
-                    generated_text = obj["_additional"]["generate"]["singleResult"]
-                    logger.info(f"Generated summary for '{obj['title']}': {generated_text}")
-                else:
-                    logger.warning(f"No generated text for {obj['title']}")
-        else:
-            logger.warning(f"No results found or unexpected response structure")
-            logger.debug(f"Response: {json.dumps(result, indent=2)}")
+        objects = generative_future.result()["objects"]
+        logger.info(f"Found {len(objects)} results")
+        
+        for idx, obj in enumerate(objects):
+            if obj.get("generated"):
+                logger.info(f"Generated summary for '{obj['title']}': {obj['generated']}")
+            else:
+                logger.warning(f"No generated text for {obj['title']}")
         
     except Exception as e:
         logger.error(f"Error in OpenAI modules experiment: {e}")
@@ -265,8 +290,6 @@ def main():
     """Main function to run the Weaviate module experiments."""
     logger.info("Starting Weaviate module experiments")
     
-    client = None
-    
     try:
         # Connect to Weaviate
         client = connect_to_weaviate()
@@ -274,13 +297,14 @@ def main():
         # Get available modules
         modules = get_available_modules(client)
         
-        # List current schema
-        list_schema(client)
+        # List current schema, fetched once and reused for the class checks below
+        schema = list_schema(client)
+        existing_classes = set(schema)
         
         # Experiment with OpenAI modules if available
-        if "text2vec-openai" in modules and "generative-openai" in modules:
+        if REQUIRED_MODULES <= modules:
             logger.info("\n==== Testing OpenAI Modules ====")
-            experiment_with_openai_modules(client)
+            experiment_with_openai_modules(client, existing_classes)
         else:
             logger.warning("OpenAI modules not available, skipping experiment")
         
@@ -289,9 +313,7 @@ def main():
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
     finally:
-        # Clean up
-        if client:
-            client.close()
+        # The shared client is closed at interpreter exit
         logger.info("Weaviate module experiments completed")
 
 
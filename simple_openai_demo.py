@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 
-import os
 import sys
-import time
 import uuid
 import logging
-from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+import openai
+from semantic_cache import SemanticCache, cached_embedding, embed_texts
+from weaviate.classes.data import DataObject
+from weaviate_client import cached_get_meta, get_client, wait_for_object_count
 
 # Set up logging
 logging.basicConfig(
@@ -19,11 +20,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SimpleOpenAIDemo")
 
-# Load environment variables
-load_dotenv()
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Load environment variables (parsed once and shared across scripts)
+cfg = settings()
+weaviate_url = cfg.weaviate_url
+weaviate_api_key = cfg.weaviate_api_key
+openai_api_key = cfg.openai_api_key
 
 if not weaviate_url or not weaviate_api_key or not openai_api_key:
     logger.error("Missing required environment variables: WEAVIATE_URL, WEAVIATE_API_KEY, or OPENAI_API_KEY")
@@ -32,41 +33,76 @@ if not weaviate_url or not weaviate_api_key or not openai_api_key:
 # Define the class name for our demo
 CLASS_NAME = "AIArticles"
 
+# Queries for the two search demos
+VECTOR_SEARCH_QUERY = "What are the ethical considerations in AI?"
+GENERATIVE_SEARCH_QUERY = "What are vector databases?"
+
+# Prompt for the generative search; Weaviate fills {content} from the matched article
+SIMPLIFY_PROMPT = "Explain this in simpler terms: {content}"
+
+# Modules the demo needs
+REQUIRED_MODULES = frozenset({"text2vec-openai", "generative-openai"})
+
+# Binary-quantized HNSW index: vectors are compared as bit codes, with the full
+# vectors only used to rescore candidates. Unlike PQ, BQ needs no training set,
+# so it works from the first object of this small demo class
+VECTOR_INDEX_CONFIG = {"distance": "cosine", "bq": {"enabled": True}}
+
+
+def _vector_search(client, openai_client, query):
+    """Return {"articles": [...]} for the two articles closest to query."""
+    # nearVector over gRPC with the cached query embedding, so the server does
+    # not call OpenAI to embed the same query text again
+    response = client.collections.get(CLASS_NAME).query.near_vector(
+        near_vector=cached_embedding(openai_client, query),
+        limit=2,
+        return_properties=["title", "content", "category"]
+    )
+    return {"articles": [article.properties for article in response.objects]}
+
+
+def _generative_search(client, openai_client, query):
+    """Return {"articles": [...]} for the article closest to query, with a
+    simplified explanation generated for it under "generated"."""
+    response = client.collections.get(CLASS_NAME).generate.near_vector(
+        near_vector=cached_embedding(openai_client, query),
+        limit=1,
+        single_prompt=SIMPLIFY_PROMPT,
+        return_properties=["title", "content"]
+    )
+    return {"articles": [{**article.properties, "generated": article.generated} for article in response.objects]}
+
+
+def _cached_search(kind, search, client, openai_client, query):
+    """Run search(client, openai_client, query) through the semantic cache for kind.
+    
+    The cache (and its SQLite connection) is opened here so that it belongs
+    to the thread the search runs on.
+    """
+    cache = SemanticCache(f"{CLASS_NAME}:{kind}", openai_client)
+    return cache.get_or_add(query, lambda: search(client, openai_client, query))
+
+
 def main():
     """Main function to demonstrate OpenAI modules in Weaviate."""
     logger.info("Starting simple OpenAI modules demonstration")
     
-    client = None
-    
     try:
-        # Connect to Weaviate
+        # Connect to Weaviate through the process-wide client (readiness is
+        # checked once, on first connect)
         logger.info(f"Connecting to Weaviate at {weaviate_url}")
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=weaviate_url,
-            auth_credentials=AuthApiKey(api_key=weaviate_api_key),
-            headers={
-                "X-OpenAI-Api-Key": openai_api_key  # For OpenAI modules
-            }
-        )
-        
-        # Check if client is ready
-        is_ready = client.is_ready()
-        logger.info(f"Connection status: {is_ready}")
-        
-        if not is_ready:
-            logger.error("Weaviate client is not ready")
-            sys.exit(1)
+        client = get_client()
         
         # Get meta information to see available modules
         logger.info("Retrieving available modules")
-        meta = client.get_meta()
+        meta = cached_get_meta(client)
         
         if 'modules' in meta:
-            modules = list(meta['modules'].keys())
-            logger.info(f"Available modules: {', '.join(modules)}")
+            modules = frozenset(meta['modules'])
+            logger.info(f"Available modules: {', '.join(meta['modules'])}")
             
             # Check if the required OpenAI modules are available
-            if 'text2vec-openai' not in modules or 'generative-openai' not in modules:
+            if not REQUIRED_MODULES <= modules:
                 logger.warning("Required OpenAI modules not available")
                 logger.warning("text2vec-openai: " + ("Available" if 'text2vec-openai' in modules else "Not available"))
                 logger.warning("generative-openai: " + ("Available" if 'generative-openai' in modules else "Not available"))
@@ -74,14 +110,14 @@ def main():
         # List existing schema
         logger.info("Checking existing schema")
         try:
-            schema = client.schema.get()
-            existing_classes = [cls['class'] for cls in schema['classes']] if 'classes' in schema else []
+            # Names only, keyed by class name for direct lookups
+            existing_classes = client.collections.list_all(simple=True)
             logger.info(f"Existing classes: {', '.join(existing_classes) if existing_classes else 'None'}")
             
             # Delete the class if it exists
             if CLASS_NAME in existing_classes:
                 logger.info(f"Deleting existing class: {CLASS_NAME}")
-                client.schema.delete_class(CLASS_NAME)
+                client.collections.delete(CLASS_NAME)
                 logger.info(f"Class {CLASS_NAME} deleted")
         except Exception as e:
             logger.error(f"Error checking schema: {e}")
@@ -93,10 +129,12 @@ def main():
                 "class": CLASS_NAME,
                 "description": "AI-related articles for demonstration",
                 "vectorizer": "text2vec-openai",
+                "vectorIndexConfig": VECTOR_INDEX_CONFIG,
                 "moduleConfig": {
                     "text2vec-openai": {
-                        "model": "ada",
-                        "modelVersion": "002",
+                        # Same model as semantic_cache.cached_embedding, so queries can
+                        # be embedded (and cached) client-side and sent as nearVector
+                        "model": "text-embedding-3-small",
                         "type": "text"
                     },
                     "generative-openai": {
@@ -122,12 +160,24 @@ def main():
                 ]
             }
             
-            client.schema.create_class(class_obj)
+            collection = client.collections.create_from_dict(class_obj)
             logger.info(f"Class {CLASS_NAME} created successfully")
+            
+            # Confirm the server built the binary-quantized index rather than
+            # falling back to full vectors
+            created = collection.config.get()
+            index_config = created.to_dict().get("vectorIndexConfig", {})
+            if index_config.get("bq", {}).get("enabled"):
+                logger.info(f"{CLASS_NAME} uses a BQ vector index")
+            else:
+                logger.warning(f"{CLASS_NAME} was created without BQ: {index_config}")
         except Exception as e:
             logger.error(f"Error creating class: {e}")
             sys.exit(1)
         
+        # Used to embed the sample articles and the queries client-side
+        openai_client = openai.OpenAI(api_key=openai_api_key)
+        
         # Add sample data
         logger.info("Adding sample data")
         try:
@@ -149,102 +199,87 @@ def main():
                 }
             ]
             
-            # Add data using batch processing
-            with client.batch as batch:
-                batch.batch_size = 10
-                
+            if logger.isEnabledFor(logging.DEBUG):
                 for idx, data in enumerate(sample_data):
-                    logger.info(f"Adding article {idx+1}: {data['title']}")
-                    
-                    # Generate a UUID for the object
-                    object_uuid = str(uuid.uuid4())
-                    
-                    # Add the data object to the batch
-                    batch.add_data_object(
-                        data_object=data,
-                        class_name=CLASS_NAME,
-                        uuid=object_uuid
-                    )
+                    logger.debug("Adding article %d: %s", idx + 1, data["title"])
+            
+            # Embed every article in one embeddings request and send the vectors
+            # along, so Weaviate does not call OpenAI once per object
+            vectors = embed_texts(openai_client, [f"{data['title']} {data['content']}" for data in sample_data])
             
-            logger.info("Sample data added successfully")
+            # The handful of objects fits in one insert_many request, which skips the
+            # batcher's background queue. The UUID comes from the title so reruns
+            # overwrite the same object
+            result = client.collections.get(CLASS_NAME).data.insert_many([
+                DataObject(properties=data, uuid=uuid.uuid5(uuid.NAMESPACE_URL, data["title"]), vector=vector.tolist())
+                for data, vector in zip(sample_data, vectors)
+            ])
+            if result.has_errors:
+                first_error = next(iter(result.errors.values()))
+                logger.warning(f"Failed to add {len(result.errors)} of {len(sample_data)} articles: {first_error.message}")
+            
+            logger.info(f"Added {len(sample_data) - len(result.errors)} articles to {CLASS_NAME}")
             
             # Wait for indexing to complete
             logger.info("Waiting for indexing to complete...")
-            time.sleep(2)
+            wait_for_object_count(client, CLASS_NAME, len(sample_data) - len(result.errors))
         except Exception as e:
             logger.error(f"Error adding sample data: {e}")
         
+        # The two searches are independent, so run both at once and report
+        # them in order afterwards. Results are cached by question similarity
+        # for a few minutes (see SemanticCache), so a repeated or reworded
+        # question skips the search round trip
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            vector_future = executor.submit(
+                _cached_search, "near_text", _vector_search, client, openai_client, VECTOR_SEARCH_QUERY
+            )
+            generative_future = executor.submit(
+                _cached_search, "generate", _generative_search, client, openai_client, GENERATIVE_SEARCH_QUERY
+            )
+        
         # Perform a vector search
         logger.info("\n=== DEMONSTRATING VECTOR SEARCH WITH TEXT2VEC-OPENAI ===\n")
         try:
-            query = "What are the ethical considerations in AI?"
-            logger.info(f"Performing semantic search with query: '{query}'")
-            
-            result = (
-                client.query
-                .get(CLASS_NAME, ["title", "content", "category"])
-                .with_near_text({"concepts": [query]})
-                .with_limit(2)
-                .do()
-            )
+            logger.info(f"Performing semantic search with query: '{VECTOR_SEARCH_QUERY}'")
+            articles = vector_future.result()["articles"]
             
-            if "data" in result and "Get" in result["data"]:
-                articles = result["data"]["Get"][CLASS_NAME]
-                logger.info(f"Found {len(articles)} relevant articles:")
-                
+            if articles:
+                # One log record for the whole result list rather than two per article
+                lines = [f"Found {len(articles)} relevant articles:"]
                 for idx, article in enumerate(articles):
-                    logger.info(f"  {idx+1}. {article['title']} (Category: {article['category']})")
-                    logger.info(f"     Content: {article['content'][:100]}...")
+                    lines.append(f"  {idx+1}. {article['title']} (Category: {article['category']})")
+                    lines.append(f"     Content: {article['content'][:100]}...")
+                logger.info("\n".join(lines))
             else:
-                logger.warning("No results found or unexpected response structure")
+                logger.warning("No results found")
         except Exception as e:
             logger.error(f"Error performing vector search: {e}")
         
         # Perform a generative query
         logger.info("\n=== DEMONSTRATING GENERATIVE AI WITH GENERATIVE-OPENAI ===\n")
         try:
-            query = "What are vector databases?"
-            logger.info(f"Performing generative search with query: '{query}'")
-            
-            result = (
-                client.query
-                .get(CLASS_NAME, ["title", "content"])
-                .with_near_text({"concepts": [query]})
-                .with_generate({"singleResult": True, "prompt": "Explain this in simpler terms:"})
-                .with_limit(1)
-                .do()
-            )
+            logger.info(f"Performing generative search with query: '{GENERATIVE_SEARCH_QUERY}'")
+            articles = generative_future.result()["articles"]
             
-            if "data" in result and "Get" in result["data"]:
-                articles = result["data"]["Get"][CLASS_NAME]
+            if articles:
+                article = articles[0]
+                logger.info(f"Article: {article['title']}")
+                logger.info(f"Original content: {article['content']}")
                 
-                if articles:
-                    article = articles[0]
-                    logger.info(f"Article: {article['title']}")
-                    logger.info(f"Original content: {article['content']}")
-                    
-                    if "_additional" in article and "generate" in article["_additional"]:
-                        generated = article["_additional"]["generate"]
-                        
-                        if "singleResult" in generated:
-                            logger.info(f"\nSimplified explanation: {generated['singleResult']}")
-                        elif "error" in generated:
-                            logger.error(f"Generation error: {generated['error']}")
-                    else:
-                        logger.warning("No generated content found")
+                if article.get("generated"):
+                    logger.info(f"\nSimplified explanation: {article['generated']}")
                 else:
-                    logger.warning("No articles found")
+                    logger.warning("No generated content found")
             else:
-                logger.warning("No results found or unexpected response structure")
+                logger.warning("No articles found")
         except Exception as e:
             logger.error(f"Error performing generative search: {e}")
     
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
     finally:
-        # Clean up
-        if client:
-            client.close()
+        # The shared client is closed at interpreter exit
         logger.info("OpenAI modules demonstration completed")
 
 
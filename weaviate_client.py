@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import time
+import random
+import tempfile
+import atexit
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import weaviate
+from weaviate.auth import AuthApiKey
+from weaviate.config import AdditionalConfig, ConnectionConfig
+from config import ROOT, settings
+from semantic_cache import local_embedder
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib decoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Connection headers, fixed by the environment at import time. Kept as a plain
+# dict (not a MappingProxyType) because the client validates it as a dict.
+_openai_api_key = settings().openai_api_key
+CONN_HEADERS: Dict[str, str] = {"X-OpenAI-Api-Key": _openai_api_key} if _openai_api_key else {}
+
+# Keep a small pool of keep-alive connections so repeated REST probes reuse
+# an open TLS connection instead of handshaking again
+CONN_CONFIG = AdditionalConfig(
+    connection=ConnectionConfig(
+        session_pool_connections=4,
+        session_pool_maxsize=8
+    )
+)
+
+# On-disk meta cache shared across runs: {url: {"fetched_at": ..., "meta": ...}}
+META_CACHE_PATH = os.path.join(ROOT, ".weaviate_meta.json")
+META_DISK_TTL = 3600
+
+# API paths that answered a probe on an earlier run: {url: {probe: path}}
+PROBE_CACHE_PATH = os.path.join(ROOT, ".weaviate_probe_paths.json")
+
+# Meta responses keyed by cluster URL: {url: (fetched_at, meta)}
+_META_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+# Cache files are read, updated and rewritten whole, so threads take turns
+_CACHE_FILE_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Connect to Weaviate Cloud once and return the shared client.
+
+    The client is closed automatically at interpreter exit, so callers
+    should not close it themselves.
+    """
+    cfg = settings()
+    client = weaviate.connect_to_weaviate_cloud(
+        cluster_url=cfg.weaviate_url,
+        auth_credentials=AuthApiKey(api_key=cfg.weaviate_api_key),
+        headers=CONN_HEADERS,
+        additional_config=CONN_CONFIG
+    )
+
+    # Check if client is ready
+    is_ready = client.is_ready()
+    logger.info(f"Connection status: {is_ready}")
+
+    if not is_ready:
+        client.close()
+        raise RuntimeError("Weaviate client is not ready")
+
+    atexit.register(client.close)
+    return client
+
+
+def _read_disk_meta(key: str, ttl: float) -> Optional[Dict[str, Any]]:
+    """Return the meta stored on disk for key if it is younger than ttl seconds."""
+    try:
+        with open(META_CACHE_PATH, encoding="utf-8") as fh:
+            entry = json.load(fh).get(key)
+    except (OSError, ValueError):
+        return None
+
+    if entry and time.time() - entry["fetched_at"] < ttl:
+        return entry["meta"]
+    return None
+
+
+def _write_json_atomic(path: str, data: Any) -> None:
+    """Write data to path as JSON through a temporary file, so readers never
+    see a partly written file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_disk_meta(key: str, meta: Dict[str, Any]) -> None:
+    """Store meta on disk for key, keeping entries for other clusters."""
+    with _CACHE_FILE_LOCK:
+        try:
+            with open(META_CACHE_PATH, encoding="utf-8") as fh:
+                entries = json.load(fh)
+        except (OSError, ValueError):
+            entries = {}
+
+        entries[key] = {"fetched_at": time.time(), "meta": meta}
+        try:
+            _write_json_atomic(META_CACHE_PATH, entries)
+        except OSError as e:
+            logger.warning(f"Could not write meta cache {META_CACHE_PATH}: {e}")
+
+
+def cached_get_meta(client, ttl: float = 60, disk_ttl: float = META_DISK_TTL) -> Dict[str, Any]:
+    """Return client.get_meta(), reusing earlier responses.
+
+    A response is reused from memory for up to ttl seconds, and from the
+    on-disk cache (shared across runs) for up to disk_ttl seconds.
+    """
+    key = client._connection.url
+    now = time.monotonic()
+
+    cached = _META_CACHE.get(key)
+    if cached is not None and now - cached[0] < ttl:
+        return cached[1]
+
+    meta = _read_disk_meta(key, disk_ttl)
+    if meta is None:
+        meta = client.get_meta()
+        _write_disk_meta(key, meta)
+
+    _META_CACHE[key] = (now, meta)
+    return meta
+
+
+def _read_probe_paths() -> Dict[str, Dict[str, str]]:
+    """Return the stored probe paths, or an empty dict if there are none."""
+    try:
+        with open(PROBE_CACHE_PATH, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def remember_path(client, probe: str, path: str) -> None:
+    """Record path as the one that answered probe, for probe_first_success on later runs."""
+    with _CACHE_FILE_LOCK:
+        entries = _read_probe_paths()
+        cluster = entries.setdefault(client._connection.url, {})
+        if cluster.get(probe) == path:
+            return
+
+        cluster[probe] = path
+        try:
+            _write_json_atomic(PROBE_CACHE_PATH, entries)
+        except OSError as e:
+            logger.warning(f"Could not write probe cache {PROBE_CACHE_PATH}: {e}")
+
+
+class RateLimiter:
+    """Token bucket allowing max_rate acquisitions per time_period seconds.
+
+    Usable from several threads; `with limiter:` blocks only once the burst
+    allowance is spent.
+    """
+
+    def __init__(self, max_rate: float, time_period: float = 1.0):
+        self.max_rate = max_rate
+        self.rate = max_rate / time_period
+        self._tokens = float(max_rate)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.max_rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+# "Please try again in 20s" / "in 350ms" in OpenAI rate-limit messages
+_RETRY_IN = re.compile(r"try again in (\d+(?:\.\d+)?)(ms|s)\b", re.IGNORECASE)
+
+
+def _is_rate_limited(message: str) -> bool:
+    """Return True if an error message reports an HTTP 429 or rate limit."""
+    lowered = message.lower()
+    return "429" in message or "rate limit" in lowered or "ratelimit" in lowered
+
+
+def _retry_after(messages: List[str]) -> Optional[float]:
+    """Return the longest delay, in seconds, the messages ask for, if any."""
+    delays = [
+        float(value) / (1000 if unit.lower() == "ms" else 1)
+        for m in messages
+        for value, unit in _RETRY_IN.findall(m)
+    ]
+    return max(delays, default=None)
+
+
+def batch_import(client, collection_name: str, objects: Iterable[Tuple[Any, ...]],
+                 on_error: Optional[Callable[[Dict[str, Any], str], None]] = None,
+                 attempts: int = 5, batch_size: int = 100, concurrent_requests: int = 2,
+                 max_delay: float = 30.0) -> None:
+    """Import (properties, uuid) or (properties, uuid, vector) tuples into
+    collection_name with the client's batcher.
+
+    Objects the vectorizer rejected for rate limiting are re-sent in up to
+    attempts passes. Before each retry pass, concurrent_requests is halved
+    and the import sleeps for the delay the errors ask for, or for an
+    exponential backoff with jitter. Other failures go to on_error.
+    """
+    pending = objects
+    for attempt in range(1, attempts + 1):
+        with client.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests) as batch:
+            for properties, object_uuid, *vector in pending:
+                batch.add_object(properties=properties, collection=collection_name, uuid=object_uuid,
+                                 vector=vector[0] if vector else None)
+
+        limited = []
+        for failed in client.batch.failed_objects:
+            if _is_rate_limited(failed.message):
+                limited.append(failed)
+            elif on_error is not None:
+                on_error(failed.object_.properties, failed.message)
+
+        if not limited:
+            return
+
+        pending = [(failed.object_.properties, failed.object_.uuid, failed.object_.vector) for failed in limited]
+        if attempt == attempts:
+            break
+
+        concurrent_requests = max(1, concurrent_requests // 2)
+        backoff = min(max_delay, 2 ** attempt) * random.uniform(0.5, 1.0)
+        delay = min(max_delay, _retry_after([failed.message for failed in limited]) or backoff)
+        logger.warning(f"{len(limited)} objects rate limited; retrying in {delay:.1f}s "
+                       f"with {concurrent_requests} concurrent requests")
+        time.sleep(delay)
+
+    logger.error(f"{len(pending)} objects still rate limited after {attempts} attempts")
+
+
+def near_search(api, text: str, **kwargs):
+    """Run a nearest-neighbour search for text on a collection's query or generate API.
+
+    With the local sentence-transformer installed, the query is embedded
+    in-process and sent as near_vector; otherwise Weaviate's vectorizer
+    embeds it (near_text).
+    """
+    model = local_embedder()
+    if model is None:
+        return api.near_text(query=text, **kwargs)
+    vector = model.encode([text], normalize_embeddings=True)[0]
+    return api.near_vector(near_vector=vector.tolist(), **kwargs)
+
+
+def response_json(response) -> Any:
+    """Decode a REST response body, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def wait_for_object_count(client, collection_name: str, expected: int,
+                          timeout: float = 5.0, interval: float = 0.05,
+                          max_interval: float = 1.6) -> bool:
+    """Poll the collection's object count until it reaches expected.
+
+    The poll interval starts at interval and doubles up to max_interval, so
+    a freshly indexed collection is seen within tens of milliseconds without
+    hammering a slow one. Returns False if the count is still short when
+    timeout seconds have passed.
+    """
+    collection = client.collections.get(collection_name)
+    start = time.monotonic()
+    deadline = start + timeout
+
+    while True:
+        count = collection.aggregate.over_all(total_count=True).total_count
+        if count >= expected:
+            logger.info(f"{collection_name} reached {count} objects after {time.monotonic() - start:.2f}s")
+            return True
+        if time.monotonic() >= deadline:
+            logger.warning(f"{collection_name} has {count} of {expected} objects after {timeout}s")
+            return False
+        time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+        interval = min(interval * 2, max_interval)
+
+
+def _successful_responses(futures):
+    """Yield (path, response) for each future that completes with a 200."""
+    for future in as_completed(futures):
+        path = futures[future]
+        try:
+            response = future.result()
+        except Exception as e:
+            logger.error(f"Error requesting via {path}: {e}")
+            continue
+
+        if response.status_code == 200:
+            yield path, response
+        else:
+            logger.warning(f"Request via {path} failed: {response.status_code} - {response.text}")
+
+
+def _first_success(request, paths: List[str], *args) -> Tuple[Optional[str], Any]:
+    """Call request(path, *args) for every path concurrently and return the first 200."""
+    executor = ThreadPoolExecutor(max_workers=len(paths))
+    futures = {executor.submit(request, path, *args): path for path in paths}
+    try:
+        return next(_successful_responses(futures), (None, None))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def post_first_success(client, paths: List[str], payload: Dict[str, Any]) -> Tuple[Optional[str], Any]:
+    """POST payload to every path concurrently and return (path, response) for the first 200.
+
+    Returns (None, None) if no path succeeds.
+    """
+    return _first_success(client._connection.post, paths, payload)
+
+
+def get_first_success(client, paths: List[str]) -> Tuple[Optional[str], Any]:
+    """GET every path concurrently and return (path, response) for the first 200.
+
+    Returns (None, None) if no path succeeds.
+    """
+    return _first_success(client._connection.get, paths)
+
+
+def probe_first_success(client, probe: str, paths: List[str],
+                        payload: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], Any]:
+    """Find the path that answers probe, GETting it (or POSTing payload if given).
+
+    The path that answered on an earlier run is tried on its own first; only
+    if it fails are all paths probed concurrently. The winner is remembered.
+    Returns (None, None) if no path succeeds.
+    """
+    def first_success(candidates):
+        if payload is None:
+            return get_first_success(client, candidates)
+        return post_first_success(client, candidates, payload)
+
+    known = _read_probe_paths().get(client._connection.url, {}).get(probe)
+    if known in paths:
+        path, response = first_success([known])
+        if response is not None:
+            return path, response
+
+    path, response = first_success(paths)
+    if response is not None:
+        remember_path(client, probe, path)
+    return path, response